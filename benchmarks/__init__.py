@@ -0,0 +1 @@
+# Benchmarks for the dashboards in this repository
@@ -0,0 +1,46 @@
+# Compare two benchmark result files stage by stage
+#
+#   python benchmarks/compare.py before.json after.json
+import argparse
+import json
+
+
+def load(path):
+    with open(path) as f:
+        results = json.load(f)
+    return results["meta"], {
+        (r["size"], r["app"], r["stage"]): r for r in results["results"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument(
+        "--metric", default="median", choices=["min", "median", "p95", "mean"]
+    )
+    args = parser.parse_args()
+
+    before_meta, before = load(args.before)
+    after_meta, after = load(args.after)
+    print(f"{before_meta.get('commit')} -> {after_meta.get('commit')} ({args.metric})")
+
+    for key in sorted(set(before) | set(after)):
+        old, new = before.get(key), after.get(key)
+        label = " ".join(key)
+        if not old or not new or "error" in old or "error" in new:
+            old_text = (old or {}).get("error", "-") if old else "-"
+            new_text = (new or {}).get("error", "-") if new else "-"
+            print(f"{label:<70} {old_text} -> {new_text}")
+            continue
+        ratio = new[args.metric] / old[args.metric] if old[args.metric] else None
+        change = f"{ratio:6.2f}x" if ratio is not None else "     -"
+        print(
+            f"{label:<70} {old[args.metric] * 1000:10.2f} ms"
+            f" {new[args.metric] * 1000:10.2f} ms {change}"
+        )
+
+
+if __name__ == "__main__":
+    main()
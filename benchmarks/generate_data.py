@@ -0,0 +1,71 @@
+# Synthetic data.csv generator for the benchmarks
+#
+#   python benchmarks/generate_data.py --regions 200 --days 365 -o /tmp/data.csv
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Named sizes: (regions, days)
+SIZES = {
+    "small": (8, 29),  # Today's data.csv
+    "medium": (200, 365),
+    "large": (1000, 1825),
+}
+
+
+# Function to build a region x date frame of "5%" strings like data.csv
+def generate_frame(regions, days, seed=0, start="2025-01-01", date_format="md"):
+    rng = np.random.default_rng(seed)
+
+    # Random walk per region, clipped to the range the dashboards colour
+    steps = rng.integers(-3, 4, size=(regions, days))
+    values = np.clip(
+        rng.integers(-5, 15, size=(regions, 1)) + steps.cumsum(axis=1), -30, 40
+    )
+
+    dates = pd.date_range(start, periods=days, freq="D")
+    if date_format == "iso":
+        headers = [d.strftime("%Y-%m-%d") for d in dates]
+    else:
+        headers = [f"{d.month}/{d.day}" for d in dates]
+
+    names = ["Global"] + [f"Region {i:04d}" for i in range(1, regions)]
+    frame = pd.DataFrame(np.char.add(values.astype(str), "%"), columns=headers)
+    frame.insert(0, "Region", names[:regions])
+    return frame
+
+
+def write_csv(path, regions, days, seed=0, date_format="md"):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    generate_frame(regions, days, seed=seed, date_format=date_format).to_csv(
+        path, index=False
+    )
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic data.csv for the benchmarks"
+    )
+    parser.add_argument("--size", choices=sorted(SIZES), help="Named size")
+    parser.add_argument("--regions", type=int, default=8)
+    parser.add_argument("--days", type=int, default=29)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--date-format",
+        choices=["md", "iso"],
+        default="md",
+        help="Column headers as m/d (like data.csv today) or YYYY-MM-DD",
+    )
+    parser.add_argument("-o", "--output", default="data.csv")
+    args = parser.parse_args()
+
+    regions, days = SIZES[args.size] if args.size else (args.regions, args.days)
+    write_csv(args.output, regions, days, seed=args.seed, date_format=args.date_format)
+    print(f"Wrote {regions} regions x {days} days to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# Load test: requests/sec and latency percentiles against a running server
+#
+#   python benchmarks/loadtest.py dash_heat --compare --size medium
+#   python benchmarks/loadtest.py standardwebapp_enhanced --target http://127.0.0.1:8050
+#
+# --compare starts the app twice on synthetic data, once on the Werkzeug dev
+# server and once through serve.py (gunicorn, preloaded), and loads each in
+# turn with the same client settings.
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generate_data import SIZES, write_csv  # noqa: E402
+
+
+def dash_update(output, outputs, inputs, state=None):
+    body = {
+        "output": output,
+        "outputs": outputs,
+        "inputs": inputs,
+        "state": state or [],
+        "changedPropIds": [f"{inputs[0]['id']}.{inputs[0]['property']}"],
+    }
+    return ("POST", "/_dash-update-component", json.dumps(body))
+
+
+# The requests one page view makes after the static bundles, per app
+REQUESTS = {
+    "dash": [
+        ("GET", "/", None),
+        dash_update(
+            "weekly-chart.figure",
+            {"id": "weekly-chart", "property": "figure"},
+            [
+                {"id": "region-select", "property": "value", "value": "Global"},
+                {"id": "view-select", "property": "value", "value": "monthly"},
+                {"id": "compare-select", "property": "value", "value": []},
+            ],
+        ),
+    ],
+    "dash_heat": [
+        ("GET", "/", None),
+        dash_update(
+            "..heatmap-chart.figure...heatmap-window.data..",
+            [
+                {"id": "heatmap-chart", "property": "figure"},
+                {"id": "heatmap-window", "property": "data"},
+            ],
+            [
+                {"id": "view-select", "property": "value", "value": "monthly"},
+                {"id": "heatmap-chart", "property": "relayoutData", "value": None},
+            ],
+            [{"id": "heatmap-window", "property": "data", "value": {}}],
+        ),
+    ],
+    "dash_template": [
+        ("GET", "/", None),
+        dash_update(
+            "weekly-graph.figure",
+            {"id": "weekly-graph", "property": "figure"},
+            [{"id": "region-select", "property": "value", "value": "Global"}],
+        ),
+    ],
+    "standardwebapp_enhanced": [("GET", "/", None), ("GET", "/data", None)],
+    "standardwebapp_template": [("GET", "/", None), ("GET", "/data", None)],
+}
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def run_client(host, port, requests, deadline, latencies, errors):
+    # One keep-alive connection per client, cycling through the page's requests
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+    i = 0
+    while time.perf_counter() < deadline:
+        method, path, body = requests[i % len(requests)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as error:
+            errors.append(type(error).__name__)
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def load(target, requests, concurrency, duration, warmup=1.0):
+    parts = urlsplit(target)
+    host, port = parts.hostname, parts.port or 80
+
+    # Short warm-up so first-hit caches are not counted
+    run_client(host, port, requests, time.perf_counter() + warmup, [], [])
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    clients = [
+        threading.Thread(
+            target=run_client, args=(host, port, requests, deadline, latencies, errors)
+        )
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": len(errors),
+        "requests_per_sec": len(ordered) / elapsed,
+        "p50": percentile(ordered, 0.50),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1] if ordered else None,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def start_server(app, server, cwd, extra):
+    port = free_port()
+    command = [
+        sys.executable,
+        os.path.join(ROOT, "serve.py"),
+        app,
+        "--server",
+        server,
+        "--port",
+        str(port),
+    ] + (extra if server != "dev" else [])
+    env = dict(os.environ, DATA_RELOAD_INTERVAL="0")
+    process = subprocess.Popen(
+        command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    wait_ready(port, process)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def report(label, result):
+    p50 = result["p50"] * 1000 if result["p50"] is not None else float("nan")
+    p99 = result["p99"] * 1000 if result["p99"] is not None else float("nan")
+    print(
+        f"{label:<10} {result['requests_per_sec']:9.1f} req/s"
+        f"   p50 {p50:8.2f} ms   p99 {p99:8.2f} ms"
+        f"   {result['requests']} ok, {result['errors']} errors"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a dashboard")
+    parser.add_argument("app", choices=sorted(REQUESTS))
+    parser.add_argument("--target", help="Base URL of a server that is already up")
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Start the dev server and serve.py on synthetic data and load both",
+    )
+    parser.add_argument("--size", default="medium", choices=sorted(SIZES))
+    parser.add_argument(
+        "--server", default="gunicorn", choices=["gunicorn", "waitress"]
+    )
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    requests = REQUESTS[args.app]
+    if args.target:
+        report("target", load(args.target, requests, args.concurrency, args.duration))
+        return
+    if not args.compare:
+        parser.error("pass --target URL or --compare")
+
+    extra = []
+    if args.workers:
+        extra += ["--workers", str(args.workers)]
+    if args.threads:
+        extra += ["--threads", str(args.threads)]
+
+    regions, days = SIZES[args.size]
+    print(
+        f"{args.app}: {regions} regions x {days} days,"
+        f" {args.concurrency} clients for {args.duration:g}s"
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        # dash/main.py reads dash/data.csv, the other apps read data.csv
+        write_csv(os.path.join(workdir, "data.csv"), regions, days)
+        write_csv(os.path.join(workdir, "dash", "data.csv"), regions, days)
+        for server in ("dev", args.server):
+            process, target = start_server(args.app, server, workdir, extra)
+            try:
+                result = load(target, requests, args.concurrency, args.duration)
+            finally:
+                process.terminate()
+                process.wait()
+            report(server, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,562 @@
+# Benchmark suite: per-stage timings and endpoint latency for all five apps
+#
+#   python benchmarks/run.py --sizes small,medium -o results.json
+#   python benchmarks/compare.py before.json after.json
+#
+# Every app is loaded against a synthetic data.csv of each size. Results are
+# written as JSON, one record per (size, app, stage), so runs on two commits
+# can be diffed with compare.py.
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+import plotly  # noqa: E402
+from plotly.io.json import to_json_plotly  # noqa: E402
+
+from benchmarks.generate_data import SIZES, write_csv  # noqa: E402
+from common.dataset import DatasetSnapshot, percent_values  # noqa: E402
+from common.dates import parse_headers  # noqa: E402
+from common.derived import Derived  # noqa: E402
+from common.pyramid import Pyramid  # noqa: E402
+from common.ranking import Ranking  # noqa: E402
+from common.snapshot import SnapshotStore, use_store  # noqa: E402
+from common.sources import LocalSource, file_fingerprint  # noqa: E402
+
+APPS = [
+    "pipeline",
+    "dash",
+    "dash_heat",
+    "dash_template",
+    "standardwebapp_enhanced",
+    "standardwebapp_template",
+]
+
+# Default repetitions per size, overridden by --repeat
+REPEATS = {"small": 20, "medium": 5, "large": 2}
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "mean": statistics.fmean(ordered),
+    }
+
+
+class Recorder:
+    # Collects one record per timed stage; a failing stage records its error
+    def __init__(self, size, repeat):
+        self.size = size
+        self.repeat = repeat
+        self.records = []
+
+    def time(self, app, stage, fn, repeat=None, setup=None, **extra):
+        samples = []
+        result = None
+        try:
+            for _ in range(repeat or self.repeat):
+                if setup is not None:
+                    setup()
+                start = time.perf_counter()
+                result = fn()
+                samples.append(time.perf_counter() - start)
+        except Exception as error:
+            message = str(error).splitlines()[0] if str(error) else ""
+            self.add(app, stage, error=f"{type(error).__name__}: {message}")
+            return None
+
+        self.add(app, stage, **summarize(samples), **extra)
+        return result
+
+    def add(self, app, stage, **fields):
+        regions, days = SIZES[self.size]
+        record = {
+            "size": self.size,
+            "regions": regions,
+            "days": days,
+            "app": app,
+            "stage": stage,
+        }
+        record.update(fields)
+        self.records.append(record)
+        status = fields.get("error") or f"{fields['median'] * 1000:.2f} ms"
+        print(f"  {app:<24} {stage:<28} {status}", file=sys.stderr)
+
+
+# Function to import an app's main.py as a fresh module
+def load_app(app):
+    path = os.path.join(ROOT, app, "main.py")
+    spec = importlib.util.spec_from_file_location(f"bench_{app}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Run in a fresh interpreter so module caches from earlier stages do not count
+STARTUP_SCRIPT = """
+import importlib.util, json, logging, sys, time
+logging.disable(logging.INFO)
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("startup", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+sys.modules["startup"] = module  # Flask resolves templates from the module file
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+if hasattr(module, "preload"):
+    module.preload()
+app = getattr(module, "server", None) or module.app
+if not hasattr(app, "test_client"):
+    app = app.server
+status = app.test_client().get("/").status_code
+ready = time.perf_counter()
+print(json.dumps({"import": imported - start, "ready": ready - start, "status": status}))
+"""
+
+
+def bench_startup(rec, app, repeat=3):
+    # Import-to-ready: module import alone, then import + preload + first page
+    samples = {"import": [], "ready": []}
+    path = os.path.join(ROOT, app, "main.py")
+    try:
+        for _ in range(repeat):
+            output = subprocess.check_output(
+                [sys.executable, "-c", STARTUP_SCRIPT, path],
+                text=True,
+                stderr=subprocess.PIPE,
+            )
+            result = json.loads(output.strip().splitlines()[-1])
+            if result["status"] != 200:
+                raise RuntimeError(f"HTTP {result['status']}")
+            samples["import"].append(result["import"])
+            samples["ready"].append(result["ready"])
+    except (subprocess.CalledProcessError, RuntimeError, ValueError) as error:
+        detail = getattr(error, "stderr", None) or str(error)
+        lines = detail.strip().splitlines()
+        rec.add(app, "startup", error=lines[-1] if lines else type(error).__name__)
+        return
+    for stage, values in samples.items():
+        rec.add(app, f"startup.{stage}", **summarize(values))
+
+
+def dash_callback(module, output, outputs, inputs, state=None):
+    # POST one callback through Dash's own dispatch route
+    client = module.app.server.test_client()
+    payload = {
+        "output": output,
+        "outputs": outputs,
+        "inputs": inputs,
+        "state": state or [],
+        "changedPropIds": [f"{inputs[0]['id']}.{inputs[0]['property']}"],
+    }
+
+    def call():
+        response = client.post("/_dash-update-component", json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return response.data
+
+    return call
+
+
+def endpoint(rec, app, stage, call, setup=None):
+    body = rec.time(app, stage, call, setup=setup)
+    if body is not None:
+        record = rec.records[-1]
+        record["bytes"] = len(body)
+        record["requests_per_sec"] = 1 / record["mean"] if record["mean"] else None
+
+
+# Function to undo the typed-array encoding (common/figures.py): numbers back
+# to JSON lists and epoch-millisecond x values back to ISO dates, the shape
+# figures were sent in before
+def as_lists(value, key=None):
+    import base64
+
+    import numpy as np
+
+    if hasattr(value, "to_plotly_json"):
+        value = value.to_plotly_json()
+    if isinstance(value, dict) and "bdata" in value:
+        array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"])
+        if "shape" in value:
+            array = array.reshape([int(n) for n in value["shape"].split(",")])
+        if key == "x" and value["dtype"] == "f8":
+            array = array.astype("datetime64[ms]").astype(str)
+        return array.tolist()
+    if isinstance(value, dict):
+        return {k: as_lists(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [as_lists(v, key) for v in value]
+    return value
+
+
+def encode(rec, app, stage, figure):
+    # Figure JSON as sent (typed arrays) and as plain lists, time and bytes;
+    # both from the plain dict so graph_objects validation is not counted
+    if hasattr(figure, "to_plotly_json"):
+        figure = figure.to_plotly_json()
+    for suffix, value in (("", figure), (".lists", as_lists(figure))):
+        body = rec.time(app, stage + suffix, lambda: to_json_plotly(value))
+        if body is not None:
+            rec.records[-1]["bytes"] = len(body)
+
+
+# Function to load an app's first snapshot, timed as its "load" stage. The
+# stores are lazy, so this is where the data file is read; None when it fails
+def load_snapshot(rec, app, module):
+    return rec.time(app, "load", lambda: module.store.current, repeat=1)
+
+
+def bench_pipeline(rec, csv_path):
+    # The load stages every app runs, timed one by one on the raw file
+    rec.time("pipeline", "fingerprint", lambda: file_fingerprint(csv_path))
+    df = rec.time("pipeline", "csv_parse", lambda: pd.read_csv(csv_path, header=0))
+    if df is None:
+        return
+    dates = df.columns[1:]
+    rec.time("pipeline", "parse_headers", lambda: parse_headers(dates))
+
+    values = rec.time("pipeline", "percent_clean", lambda: percent_values(df[dates]))
+
+    def melt():
+        plot_df = df.melt(id_vars=["Region"], var_name="Date", value_name="Change")
+        plot_df["Change"] = plot_df["Change"].str.replace("%", "", regex=False)
+        plot_df["Change"] = plot_df["Change"].astype(float)
+        plot_df["Date"] = plot_df["Date"].map(dict(zip(dates, parse_headers(dates))))
+        return plot_df.sort_values("Date")
+
+    plot_df = rec.time("pipeline", "melt", melt)
+
+    def monthly_groupby():
+        monthly_df = plot_df.copy()
+        monthly_df["Month"] = monthly_df["Date"].dt.strftime("%Y-%m")
+        return monthly_df.groupby(["Region", "Month"]).agg({"Change": "mean"})
+
+    if plot_df is not None:
+        rec.time("pipeline", "monthly_groupby", monthly_groupby)
+
+    # float32 levels, as common.dataset.Prepared builds them for the apps
+    def pyramid_build():
+        return Pyramid(values, parse_headers(dates), dtype="float32")
+
+    if values is not None:
+        pyramid = rec.time("pipeline", "pyramid_build", pyramid_build)
+        if pyramid is not None:
+            rec.time("pipeline", "derived", lambda: Derived(pyramid))
+            dataset = rec.time(
+                "pipeline",
+                "dataset",
+                lambda: DatasetSnapshot("0", pyramid, df["Region"]),
+            )
+            if dataset is not None:
+                # Resident size against the string and long frames it replaces
+                record = rec.records[-1]
+                record["bytes"] = dataset.footprint()["total"]
+                if plot_df is not None:
+                    record["frame_bytes"] = int(
+                        df.memory_usage(deep=True).sum()
+                        + plot_df.memory_usage(deep=True).sum()
+                    )
+
+
+def bench_index(rec, app, module, snapshot):
+    # The page shell: rendered once per version (cold), then served from memory
+    call = get(module.app.server.test_client(), "/")
+    endpoint(rec, app, "route.index.cold", call, snapshot.cache.clear)
+    endpoint(rec, app, "route.index.warm", call)
+
+
+def bench_dash(rec):
+    module = rec.time("dash", "import", lambda: load_app("dash"), repeat=1)
+    if module is None:
+        return
+    snapshot = load_snapshot(rec, "dash", module)
+    if snapshot is None:
+        return
+
+    for view in ("daily", "monthly"):
+        figure = rec.time(
+            "dash",
+            f"create_figure.{view}",
+            lambda: module.create_figure(snapshot, "Global", view),
+        )
+        if figure is not None:
+            encode(rec, "dash", f"json.{view}", figure)
+
+    # Overlay cost as the number of compared regions grows
+    for k in (2, 8, 32):
+        regions = snapshot.dataset.regions[: min(k, len(snapshot.dataset))]
+        figure = rec.time(
+            "dash",
+            f"create_comparison_figure.k{k}",
+            lambda: module.create_comparison_figure(snapshot, regions, "daily"),
+        )
+        if figure is not None:
+            encode(rec, "dash", f"json.compare.k{k}", figure)
+
+    call = dash_callback(
+        module,
+        "weekly-chart.figure",
+        {"id": "weekly-chart", "property": "figure"},
+        [
+            {"id": "region-select", "property": "value", "value": "Global"},
+            {"id": "view-select", "property": "value", "value": "daily"},
+            {"id": "compare-select", "property": "value", "value": []},
+        ],
+    )
+    endpoint(rec, "dash", "callback.update_chart.cold", call, snapshot.cache.clear)
+    endpoint(rec, "dash", "callback.update_chart.warm", call)
+
+    call = dash_callback(
+        module,
+        "top-movers.children",
+        {"id": "top-movers", "property": "children"},
+        [
+            {"id": "view-select", "property": "value", "value": "daily"},
+            {"id": "weekly-chart", "property": "clickData", "value": None},
+        ],
+    )
+    endpoint(rec, "dash", "callback.update_movers", call)
+    bench_index(rec, "dash", module, snapshot)
+
+
+def bench_dash_heat(rec):
+    module = rec.time("dash_heat", "import", lambda: load_app("dash_heat"), repeat=1)
+    if module is None:
+        return
+    snapshot = load_snapshot(rec, "dash_heat", module)
+    if snapshot is None:
+        return
+
+    for view in ("daily", "monthly"):
+        figure = rec.time(
+            "dash_heat",
+            f"create_heatmap.{view}",
+            lambda: module.create_heatmap(snapshot, view),
+        )
+        if figure is not None:
+            encode(rec, "dash_heat", f"json.{view}", figure)
+    tile = rec.time(
+        "dash_heat",
+        "create_heatmap_tile.daily",
+        lambda: module.create_heatmap_tile(snapshot, "daily"),
+    )
+    if tile is not None:
+        encode(rec, "dash_heat", "json.tile", tile)
+
+    call = dash_callback(
+        module,
+        "..heatmap-chart.figure...heatmap-window.data..",
+        [
+            {"id": "heatmap-chart", "property": "figure"},
+            {"id": "heatmap-window", "property": "data"},
+        ],
+        [
+            {"id": "view-select", "property": "value", "value": "monthly"},
+            {"id": "heatmap-chart", "property": "relayoutData", "value": None},
+        ],
+        [{"id": "heatmap-window", "property": "data", "value": {}}],
+    )
+    endpoint(
+        rec, "dash_heat", "callback.update_heatmap.cold", call, snapshot.cache.clear
+    )
+    endpoint(rec, "dash_heat", "callback.update_heatmap.warm", call)
+    bench_index(rec, "dash_heat", module, snapshot)
+
+
+def bench_dash_template(rec):
+    module = rec.time(
+        "dash_template", "import", lambda: load_app("dash_template"), repeat=1
+    )
+    if module is None:
+        return
+    snapshot = load_snapshot(rec, "dash_template", module)
+    if snapshot is None:
+        return
+
+    figure = rec.time(
+        "dash_template",
+        "build_region_figure",
+        lambda: module.build_region_figure(snapshot.dataset, "Global"),
+    )
+    if figure is not None:
+        encode(rec, "dash_template", "json", figure)
+
+    call = dash_callback(
+        module,
+        "weekly-graph.figure",
+        {"id": "weekly-graph", "property": "figure"},
+        [{"id": "region-select", "property": "value", "value": "Global"}],
+    )
+    endpoint(
+        rec, "dash_template", "callback.update_graph.cold", call, snapshot.cache.clear
+    )
+    endpoint(rec, "dash_template", "callback.update_graph.warm", call)
+    bench_index(rec, "dash_template", module, snapshot)
+
+
+def get(client, url):
+    def call():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return response.data
+
+    return call
+
+
+def bench_enhanced(rec):
+    app = "standardwebapp_enhanced"
+    module = rec.time(app, "import", lambda: load_app(app), repeat=1)
+    if module is None:
+        return
+    snapshot = load_snapshot(rec, app, module)
+    if snapshot is None:
+        return
+
+    # The legacy payload's weekly and monthly dicts, from the prepared pyramid
+    dataset = snapshot.dataset
+    rec.time(app, "aggregate_weekly", lambda: module.aggregate_weekly(dataset))
+    rec.time(app, "aggregate_monthly", lambda: module.aggregate_monthly(dataset))
+
+    call = get(module.app.test_client(), "/data")
+    endpoint(rec, app, "route.get_data.cold", call, snapshot.cache.clear)
+    endpoint(rec, app, "route.get_data.warm", call)
+    # The pre-columnar schema, still served behind ?schema=legacy
+    legacy = get(module.app.test_client(), "/data?schema=legacy")
+    endpoint(rec, app, "route.get_data.legacy.cold", legacy, snapshot.cache.clear)
+
+    # Top movers: a slice of the load-time index against a sort per request
+    rec.time(app, "ranking_build", lambda: Ranking(dataset.pyramid, dataset.regions))
+    rec.time(
+        app,
+        "rank.full_sort",
+        lambda: dataset.values[:, -1].argsort()[::-1][:5],
+    )
+    rec.time(app, "rank.top", lambda: snapshot.ranking["daily"].top(-1, 5))
+    client = module.app.test_client()
+    endpoint(rec, app, "route.rank", get(client, "/rank?k=5"))
+    endpoint(rec, app, "route.rank.monthly", get(client, "/rank?level=monthly&k=5"))
+
+    # One 50 x 30 window of the table, what the page fetches per block
+    call = get(client, "/table?view=daily&row=0&rows=50&col=0&cols=30")
+    endpoint(rec, app, "route.table.block", call)
+
+
+def bench_template(rec, csv_path):
+    app = "standardwebapp_template"
+    module = rec.time(app, "import", lambda: load_app(app), repeat=1)
+    if module is None:
+        return
+
+    # Point the app at the synthetic file instead of its own data.csv
+    use_store(
+        module,
+        SnapshotStore(LocalSource(csv_path), module.build_snapshot, lazy=True),
+    )
+    snapshot = load_snapshot(rec, app, module)
+    if snapshot is None:
+        return
+
+    call = get(module.app.test_client(), "/data")
+    endpoint(rec, app, "route.get_data.cold", call, snapshot.cache.clear)
+    endpoint(rec, app, "route.get_data.warm", call)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboards")
+    parser.add_argument(
+        "--sizes", default="small,medium,large", help="Comma-separated sizes"
+    )
+    parser.add_argument("--apps", default=",".join(APPS), help="Comma-separated apps")
+    parser.add_argument("--repeat", type=int, help="Repetitions per stage")
+    parser.add_argument(
+        "--no-startup", action="store_true", help="Skip the subprocess startup timings"
+    )
+    parser.add_argument("-o", "--output", help="JSON results file (default stdout)")
+    args = parser.parse_args()
+
+    # No reload watcher threads and no per-load log lines while timing
+    os.environ["DATA_RELOAD_INTERVAL"] = "0"
+    logging.disable(logging.INFO)
+
+    apps = args.apps.split(",")
+    records = []
+    cwd = os.getcwd()
+    for size in args.sizes.split(","):
+        regions, days = SIZES[size]
+        print(f"{size}: {regions} regions x {days} days", file=sys.stderr)
+        rec = Recorder(size, args.repeat or REPEATS[size])
+
+        with tempfile.TemporaryDirectory() as workdir:
+            # dash/main.py reads dash/data.csv, the other apps read data.csv
+            csv_path = write_csv(os.path.join(workdir, "data.csv"), regions, days)
+            write_csv(os.path.join(workdir, "dash", "data.csv"), regions, days)
+            os.chdir(workdir)
+            try:
+                if "pipeline" in apps:
+                    bench_pipeline(rec, csv_path)
+                if "dash" in apps:
+                    bench_dash(rec)
+                if "dash_heat" in apps:
+                    bench_dash_heat(rec)
+                if "dash_template" in apps:
+                    bench_dash_template(rec)
+                if "standardwebapp_enhanced" in apps:
+                    bench_enhanced(rec)
+                if "standardwebapp_template" in apps:
+                    bench_template(rec, csv_path)
+                if not args.no_startup:
+                    for app in apps:
+                        if app != "pipeline":
+                            bench_startup(rec, app)
+            finally:
+                os.chdir(cwd)
+        records.extend(rec.records)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "plotly": plotly.__version__,
+            "machine": platform.machine(),
+        },
+        "results": records,
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Scaling benchmark: pyramid build time against the number of worker processes
+#
+#   python benchmarks/scaling.py --regions 5000 --days 1095 --cores 1,2,4,8
+#
+# The base matrix is built once from a synthetic data.csv frame; every core
+# count then builds the daily/weekly/monthly/quarterly pyramid from it,
+# sharded by region blocks (PYRAMID_WORKERS), and is checked against the
+# single-process result. Each pool is warmed with one build, so the timings
+# are the steady state a reload sees; that first build is reported on its own
+# as "first". It includes starting the pool, and every spawned worker re-runs
+# the top level of the __main__ script (this one here, serve.py in
+# production; see aggregate.enable_workers).
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from benchmarks.generate_data import generate_frame  # noqa: E402
+from common import aggregate  # noqa: E402
+from common.dataset import percent_values  # noqa: E402
+from common.dates import parse_headers  # noqa: E402
+from common.pyramid import Pyramid  # noqa: E402
+
+
+def build(values, dates, cores, repeat):
+    # One warm-up build, which starts the pool, then the timed ones
+    start = time.perf_counter()
+    pyramid = Pyramid(values, dates, workers=cores)
+    first = time.perf_counter() - start
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Pyramid(values, dates, workers=cores)
+        samples.append(time.perf_counter() - start)
+    return pyramid, first, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pyramid build scaling by cores")
+    parser.add_argument("--regions", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=1095)
+    parser.add_argument("--cores", default="1,2,4,8", help="Comma-separated counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", help="JSON results file")
+    args = parser.parse_args()
+
+    # Every core count is sharded, however small the matrix
+    aggregate.PARALLEL_MIN_CELLS = 0
+
+    frame = generate_frame(args.regions, args.days)
+    dates = parse_headers(frame.columns[1:])
+    values = percent_values(frame.iloc[:, 1:])
+    print(
+        f"{args.regions} regions x {args.days} days,"
+        f" {os.cpu_count()} cores available",
+        file=sys.stderr,
+    )
+
+    records = []
+    reference = None
+    baseline = None
+    counts = [int(c) for c in args.cores.split(",")]
+    for cores in counts:
+        pyramid, first, samples = build(values, dates, cores, args.repeat)
+        if reference is None:
+            reference = pyramid.buffer
+        elif not np.array_equal(reference, pyramid.buffer, equal_nan=True):
+            raise SystemExit(f"{cores} cores: result differs from {counts[0]} cores")
+
+        median = statistics.median(samples)
+        baseline = baseline or median
+        records.append(
+            {
+                "cores": cores,
+                "first": first,
+                "median": median,
+                "min": min(samples),
+                "speedup": baseline / median,
+            }
+        )
+        print(
+            f"{cores:>3} cores  {median * 1000:9.1f} ms  (first {first * 1000:7.1f} ms)"
+            f"   x{baseline / median:5.2f}   efficiency {baseline / median / cores:4.0%}"
+        )
+        aggregate.shutdown()
+
+    if args.output:
+        results = {
+            "meta": {
+                "regions": args.regions,
+                "days": args.days,
+                "cpu_count": os.cpu_count(),
+            },
+            "results": records,
+        }
+        with open(args.output, "w") as f:
+            f.write(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
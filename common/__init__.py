@@ -0,0 +1 @@
+# Shared data layer for the dashboards in this repository
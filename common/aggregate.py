@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Processes that build the level matrices, each on a block of regions. 1 (the
+# default) builds in the calling process; "0" uses every core. Only applies
+# once the entry point calls enable_workers() (see pool)
+WORKERS = int(os.environ.get("PYRAMID_WORKERS", "1")) or os.cpu_count() or 1
+
+# Base matrices smaller than this are built in-process whatever WORKERS says:
+# starting the pool costs more than the aggregation saves
+PARALLEL_MIN_CELLS = int(os.environ.get("PYRAMID_PARALLEL_MIN_CELLS", "2000000"))
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+_workers_enabled = False
+
+
+# Function to fill `buffer` with the bucket means of every level and return
+# the level matrices over it, sharded across processes for large inputs
+def fill(base, groups, buffer, sizes, workers=None):
+    if workers is None:
+        workers = WORKERS if _workers_enabled else 1
+    if workers > 1 and base.shape[0] > 1 and base.size >= PARALLEL_MIN_CELLS:
+        fill_parallel(base, groups, buffer, sizes, workers)
+    else:
+        fill_levels(base, groups, level_views(buffer, base.shape[0], sizes))
+    return level_views(buffer, base.shape[0], sizes)
+
+
+# Function to lay the region x bucket matrix of every level over one buffer
+def level_views(buffer, n_rows, sizes):
+    views = []
+    offset = 0
+    for size in sizes:
+        views.append(buffer[offset : offset + n_rows * size].reshape(n_rows, size))
+        offset += n_rows * size
+    return views
+
+
+# Function to write every level's bucket means for the rows of `base` into
+# `matrices`; `groups` holds each level's bucket starts (None for daily).
+# Rows are independent, so a block of regions can be filled on its own
+def fill_levels(base, groups, matrices):
+    # Missing cells are skipped in the means, like a pandas groupby
+    valid = ~np.isnan(base)
+    filled = np.where(valid, base, 0.0)
+    for starts, z in zip(groups, matrices):
+        if starts is None:
+            z[:] = base
+            continue
+        sums = np.add.reduceat(filled, starts, axis=1)
+        cells = np.add.reduceat(valid, starts, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            np.divide(sums, cells, out=z)
+        z[cells == 0] = np.nan
+
+
+# Function to fill the pyramid buffer from a pool of processes, one block of
+# regions each. The base matrix and the output buffer live in shared memory:
+# workers read their rows of the one and write their rows of every level into
+# the other in place, so nothing is pickled but block bounds and the results
+# need no stitching beyond a single copy out of shared memory
+def fill_parallel(base, groups, buffer, sizes, workers):
+    n_rows = base.shape[0]
+    workers = min(workers, n_rows)
+    source = shared_memory.SharedMemory(create=True, size=max(base.nbytes, 1))
+    target = shared_memory.SharedMemory(create=True, size=max(buffer.nbytes, 1))
+    try:
+        shared = np.ndarray(base.shape, dtype=base.dtype, buffer=source.buf)
+        shared[:] = base
+        del shared
+
+        bounds = np.linspace(0, n_rows, workers + 1).astype(int)
+        blocks = [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+        jobs = [
+            pool(workers).submit(
+                fill_block,
+                source.name,
+                target.name,
+                base.shape,
+                buffer.dtype.str,
+                groups,
+                sizes,
+                lo,
+                hi,
+            )
+            for lo, hi in blocks
+        ]
+        try:
+            for job in jobs:
+                job.result()
+        except BrokenProcessPool:
+            # A worker died (killed, out of memory); start a fresh pool next time
+            shutdown()
+            raise
+
+        result = np.ndarray(buffer.shape, dtype=buffer.dtype, buffer=target.buf)
+        buffer[:] = result
+        del result
+    finally:
+        for block in (source, target):
+            block.close()
+            block.unlink()
+
+
+# Worker side of fill_parallel: rows lo:hi of the shared base into rows lo:hi
+# of every shared level matrix
+def fill_block(source_name, target_name, shape, dtype, groups, sizes, lo, hi):
+    source = shared_memory.SharedMemory(name=source_name)
+    target = shared_memory.SharedMemory(name=target_name)
+    try:
+        base = np.ndarray(shape, dtype=float, buffer=source.buf)
+        buffer = np.ndarray(shape[0] * sum(sizes), dtype=dtype, buffer=target.buf)
+        matrices = [z[lo:hi] for z in level_views(buffer, shape[0], sizes)]
+        fill_levels(base[lo:hi], groups, matrices)
+        del base, buffer, matrices
+    finally:
+        source.close()
+        target.close()
+
+
+# Function to get the process pool for `workers` processes, started on first
+# use and kept for later reloads
+def pool(workers):
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is None or _pool_key != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: the callers hold reload and server threads, which a plain
+            # fork would copy mid-flight, and unlike forkserver there is no
+            # per-process server a forked server worker would inherit but
+            # could not use. A spawned worker re-runs the top level of the
+            # __main__ script before importing this module, hence
+            # enable_workers()
+            context = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(workers, mp_context=context)
+            _pool_key = workers
+        return _pool
+
+
+# Function to let fill() shard by WORKERS, for entry points whose top level
+# is cheap to re-run in every worker. serve.py's is a few imports; the apps'
+# own `python main.py` scripts build their servers and start their reload
+# threads at import time, so under them (and anything else that has not
+# opted in) the pyramid is built in-process
+def enable_workers():
+    global _workers_enabled
+    _workers_enabled = True
+
+
+def shutdown():
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pool_key = None
+
+
+def _after_fork():
+    # A process forked from one with a pool (a gunicorn worker forked from a
+    # preloading master) cannot use it: the pool's threads and processes
+    # belong to the parent. The child starts its own on first use
+    global _pool, _pool_key, _pool_lock
+    _pool = None
+    _pool_key = None
+    _pool_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,149 @@
+import sys
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from common import metrics
+from common.dates import parse_headers
+from common.pyramid import Pyramid
+from common.sources import FrameSource, load_frame
+
+
+class DatasetSnapshot:
+    # One version of the region x date data as a few flat arrays: the daily
+    # values and monthly means as float32 region x bucket matrices, the region
+    # names and their row numbers, and the dates and months of the columns.
+    # The matrices are views of the pyramid they come from when it is float32
+    # (see Prepared), so the pyramid is kept here and counted with them.
+    # Fixed slots and read-only arrays, so it can be shared between callbacks
+    # and threads, swapped as one reference, and its size added up exactly
+    __slots__ = (
+        "version",
+        "pyramid",
+        "values",
+        "monthly",
+        "regions",
+        "region_index",
+        "dates",
+        "months",
+    )
+
+    def __init__(self, version, pyramid, regions):
+        daily = pyramid["daily"]
+        monthly = pyramid["monthly"]
+        assign = object.__setattr__
+        assign(self, "version", version)
+        assign(self, "pyramid", pyramid)
+        assign(self, "values", frozen(daily.z))
+        assign(self, "monthly", frozen(monthly.z))
+        assign(self, "regions", tuple(regions))
+        index = {region: i for i, region in enumerate(self.regions)}
+        assign(self, "region_index", MappingProxyType(index))
+        assign(self, "dates", pd.DatetimeIndex(pyramid.dates))
+        assign(self, "months", monthly.periods)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __len__(self):
+        return len(self.regions)
+
+    def row(self, region):
+        return self.region_index[region]
+
+    def series(self, region, level="daily"):
+        # One region's values and the dates they fall on; monthly values sit
+        # at the middle of their month for display
+        row = self.region_index[region]
+        if level == "daily":
+            return self.dates, self.values[row]
+        return self.months.to_timestamp() + pd.Timedelta(days=14), self.monthly[row]
+
+    def footprint(self):
+        # Bytes held per part. "levels" is the pyramid buffer, every level of
+        # it; values and monthly are counted on their own only when they are
+        # copies rather than views of it. region_index shares its keys with
+        # regions, so only its dict is counted
+        buffer = self.pyramid.buffer
+        parts = {
+            "levels": buffer.nbytes,
+            "regions": sys.getsizeof(self.regions)
+            + sum(sys.getsizeof(region) for region in self.regions),
+            "region_index": sys.getsizeof(dict(self.region_index)),
+            "dates": self.dates.nbytes,
+            "months": self.months.nbytes,
+        }
+        for name in ("values", "monthly"):
+            matrix = getattr(self, name)
+            if not np.shares_memory(matrix, buffer):
+                parts[name] = matrix.nbytes
+        parts["total"] = sum(parts.values())
+        return parts
+
+
+# Function to lock a float32 matrix against writes, copying it to float32
+# first if it is not one already
+def frozen(z):
+    z = np.ascontiguousarray(z, dtype=np.float32)
+    z.flags.writeable = False
+    return z
+
+
+# Function to turn the "5%" cells of a region x date frame into one float
+# matrix: a single string pass over every cell, rather than one per column
+def percent_values(frame):
+    cells = pd.Series(frame.to_numpy().ravel()).astype(str)
+    values = cells.str.replace("%", "", regex=False).astype(float).to_numpy()
+    return values.reshape(frame.shape)
+
+
+class Prepared:
+    # One version of the source cleaned and aggregated once: the raw frame,
+    # the regions, the "%" values as a float matrix and the dates of its
+    # columns (both in file order), the float32 pyramid and its
+    # DatasetSnapshot, whose matrices are views of the pyramid.
+    # Every dashboard builds its snapshot from one of these; the combined
+    # host (host/main.py) builds a single one for all of them
+    def __init__(self, frame, version, name="data"):
+        self.version = version
+        self.frame = frame
+        self.regions = frame.iloc[:, 0].tolist()
+        with metrics.stage("clean"):
+            self.values = percent_values(frame.iloc[:, 1:])
+        # Shared by every dashboard's part, so nobody may write to it
+        self.values.flags.writeable = False
+        # Years inferred from the column order, so files spanning years line up
+        self.dates = parse_headers(frame.columns[1:])
+        with metrics.stage("pyramid"):
+            self.pyramid = Pyramid(self.values, self.dates, dtype=np.float32)
+        self.dataset = DatasetSnapshot(version, self.pyramid, self.regions)
+        metrics.record_dataset(name, self)
+
+    def footprint(self):
+        # The dataset's parts plus the cleaned matrix and the raw frame, which
+        # the dashboards' snapshots keep alive alongside it
+        parts = self.dataset.footprint()
+        parts["clean"] = self.values.nbytes
+        parts["frame"] = int(self.frame.memory_usage(deep=True).sum())
+        parts["total"] += parts["clean"] + parts["frame"]
+        return parts
+
+
+class PreparedSource(FrameSource):
+    # A source whose frame is already prepared, handed to every dashboard's
+    # build_snapshot by the host so none of them cleans or aggregates again
+    def __init__(self, prepared, name="frame"):
+        super().__init__(prepared.frame, name=name)
+        self.prepared = prepared
+
+
+# Function to get the prepared data for one version of a source: the shared
+# one when the host passes it, built from a fresh read otherwise
+def prepare(source, version):
+    if isinstance(source, PreparedSource) and source.prepared.version == version:
+        return source.prepared
+    return Prepared(load_frame(source), version, name=source.name)
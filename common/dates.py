@@ -0,0 +1,87 @@
+import calendar
+import os
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Year of the latest m/d column. Unset, it is the latest year that does not
+# put that column in the future, i.e. the file is assumed to run up to today
+DATA_YEAR = os.environ.get("DATA_YEAR")
+
+# "3/9", or "3/9.1" for the second 3/9 column when pandas de-duplicates a
+# header that repeats across years
+MONTH_DAY = re.compile(r"^(\d{1,2})/(\d{1,2})(?:\.\d+)?$")
+MONTH_DAY_YEAR = re.compile(r"^\d{1,2}/\d{1,2}/\d{4}$")
+
+
+# Function to turn date column headers into one DatetimeIndex, in column order.
+# Headers with a year ("2024-12-31", "12/31/2024") are parsed as they are.
+# Year-less "m/d" headers get their years from the column order: the file
+# runs one way in time (ascending or descending, whichever most steps go),
+# and every step against that direction is a year boundary, so 12/31 -> 1/1
+# in an ascending file starts the next year
+def parse_headers(headers, year=None):
+    headers = [str(header).strip() for header in headers]
+    if not headers:
+        return pd.DatetimeIndex([])
+
+    matches = [MONTH_DAY.match(header) for header in headers]
+    if not all(matches):
+        if all(MONTH_DAY_YEAR.match(header) for header in headers):
+            return pd.DatetimeIndex(pd.to_datetime(headers, format="%m/%d/%Y"))
+        return pd.DatetimeIndex(pd.to_datetime(headers, format="ISO8601"))
+
+    month = np.array([int(match.group(1)) for match in matches])
+    day = np.array([int(match.group(2)) for match in matches])
+
+    # Position within a year, and the years gained or lost along the columns
+    key = month * 32 + day
+    steps = np.diff(key)
+    ascending = np.count_nonzero(steps > 0) >= np.count_nonzero(steps < 0)
+    # A repeated m/d (a step of zero) is also a full year on
+    wraps = steps <= 0 if ascending else steps >= 0
+    offset = np.r_[0, np.cumsum(wraps)]
+    if not ascending:
+        offset = -offset
+
+    # Anchor the latest column, then every other column is relative to it
+    latest = int(np.argmax(offset * 400 + key))
+    explicit = year is not None or bool(DATA_YEAR)
+    if year is None:
+        year = latest_year(month[latest], day[latest])
+    years = year + offset - offset[latest]
+
+    # A 2/29 column has to land in a leap year. Without an explicit year the
+    # file is taken to end in the latest year that allows it (at most seven
+    # years back); with one, or when no anchor fits, the headers are rejected
+    leap_days = (month == 2) & (day == 29)
+    if leap_days.any():
+        for back in range(1 if explicit else 8):
+            if all(calendar.isleap(y) for y in years[leap_days] - back):
+                years = years - back
+                break
+        else:
+            raise ValueError(
+                f"2/29 column does not fall in a leap year with the last column"
+                f" in {year}; set DATA_YEAR to the year of the last column"
+            )
+
+    return pd.DatetimeIndex(pd.to_datetime({"year": years, "month": month, "day": day}))
+
+
+def latest_year(month, day):
+    if DATA_YEAR:
+        return int(DATA_YEAR)
+    today = date.today()
+    return today.year if (month, day) <= (today.month, today.day) else today.year - 1
+
+
+# Function to label dates as the files do ("3/9"), adding the year only when
+# the data spans more than one
+def date_labels(dates):
+    dates = pd.DatetimeIndex(dates)
+    if len(set(dates.year)) > 1:
+        return [f"{d.month}/{d.day}/{d.year % 100:02d}" for d in dates]
+    return [f"{d.month}/{d.day}" for d in dates]
@@ -0,0 +1,108 @@
+import warnings
+
+import numpy as np
+
+# Trailing rolling-mean window per level, in that level's buckets
+ROLLING_WINDOWS = {
+    "daily": 7,
+    "weekly": 4,
+    "monthly": 3,
+    "quarterly": 2,
+}
+
+# Per-region percentiles kept for every level
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Names of the per-region summary fields, in the order of LevelMetrics.summary
+SUMMARY_FIELDS = ["min", "max", "mean"] + [f"p{p}" for p in PERCENTILES]
+
+
+def rolling_mean(z, window):
+    # Trailing mean over `window` columns for every row at once, from two
+    # cumulative sums (values and non-missing counts) instead of one pass per
+    # window; the first columns average the shorter window they have, and
+    # missing cells are skipped like pandas rolling(min_periods=1)
+    valid = ~np.isnan(z)
+    sums = np.zeros((z.shape[0], z.shape[1] + 1))
+    cells = np.zeros((z.shape[0], z.shape[1] + 1))
+    np.cumsum(np.where(valid, z, 0.0), axis=1, out=sums[:, 1:])
+    np.cumsum(valid, axis=1, out=cells[:, 1:])
+    start = np.maximum(np.arange(z.shape[1]) + 1 - window, 0)
+    totals = sums[:, 1:] - sums[:, start]
+    counts = cells[:, 1:] - cells[:, start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def summarize(z):
+    # Min, max, mean and PERCENTILES of every row from one row-wise sort:
+    # NaNs sort to the end, so each row's valid values are its first n cells
+    # and every statistic is a gather (np.nanpercentile loops over the rows).
+    # Percentiles interpolate linearly, like numpy's default; rows with no
+    # data get NaN
+    ordered = np.sort(z, axis=1)
+    n = np.count_nonzero(~np.isnan(z), axis=1)
+    last = np.maximum(n - 1, 0)[:, None]
+    rows = np.arange(z.shape[0])[:, None]
+
+    position = last * (np.array(PERCENTILES) / 100.0)
+    below = np.floor(position).astype(int)
+    above = np.minimum(below + 1, last)
+    fraction = position - below
+    percentiles = (
+        ordered[rows, below] * (1 - fraction) + ordered[rows, above] * fraction
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(z, axis=1)
+    summary = np.column_stack(
+        [ordered[:, 0], ordered[rows[:, 0], last[:, 0]], mean, percentiles]
+    )
+    summary[n == 0] = np.nan
+    return summary
+
+
+class LevelMetrics:
+    # Derived values for one region x bucket matrix, computed once per version
+    def __init__(self, name, z, window):
+        z = np.asarray(z, dtype=float)
+        self.name = name
+        self.window = window
+        self.rolling = rolling_mean(z, window)  # Same shape as z
+
+        # Per-region summary, one row per region in SUMMARY_FIELDS order
+        self.summary = summarize(z)
+
+        # Buckets up, down and flat per region (missing cells are none of these)
+        self.positive = np.count_nonzero(z > 0, axis=1)
+        self.negative = np.count_nonzero(z < 0, axis=1)
+        self.zero = np.count_nonzero(z == 0, axis=1)
+
+    def stats(self, row, decimals=1):
+        # One region's summary as a JSON-ready dict (None for missing values)
+        values = np.round(self.summary[row], decimals)
+        stats = {
+            field: (None if np.isnan(value) else float(value))
+            for field, value in zip(SUMMARY_FIELDS, values)
+        }
+        stats["positive"] = int(self.positive[row])
+        stats["negative"] = int(self.negative[row])
+        stats["zero"] = int(self.zero[row])
+        return stats
+
+    def table(self, regions, decimals=1):
+        return {region: self.stats(i, decimals) for i, region in enumerate(regions)}
+
+
+class Derived:
+    # Rolling means, per-region summaries and sign counts for every level of a
+    # pyramid, so callbacks and payloads look them up instead of computing them
+    def __init__(self, pyramid, windows=ROLLING_WINDOWS):
+        self.levels = {
+            name: LevelMetrics(name, pyramid[name].z, windows[name])
+            for name in pyramid.names
+        }
+
+    def __getitem__(self, name):
+        return self.levels[name]
@@ -0,0 +1,60 @@
+import base64
+
+# Marker colours by sign, computed by plotly.js from the y values themselves
+# (green from zero up, red below), so a figure carries no per-point colour
+# strings and building one does no per-point Python work. With cmin/cmax at
+# -1/1 a value maps to (v + 1) / 2, putting zero exactly on the green step
+SIGN_COLORSCALE = [
+    [0, "#e74c3c"],  # Red for negative values
+    [0.49995, "#e74c3c"],
+    [0.5, "#2ecc71"],  # Green for zero and positive values
+    [1, "#2ecc71"],
+]
+
+
+# Empty chart for the layout Dash validates at startup, before any data is
+# loaded (see layout_snapshot in common/snapshot.py)
+PLACEHOLDER_FIGURE = {
+    "data": [],
+    "layout": {
+        "paper_bgcolor": "#fffdf5",
+        "plot_bgcolor": "#fffdf5",
+        "xaxis": {"visible": False},
+        "yaxis": {"visible": False},
+    },
+}
+
+
+def sign_marker(values, size=8):
+    return {
+        "color": values,
+        "colorscale": SIGN_COLORSCALE,
+        "cmin": -1,
+        "cmax": 1,
+        "showscale": False,
+        "size": size,
+    }
+
+
+# Numeric columns go to plotly.js as typed arrays, {"dtype", "bdata",
+# "shape"}, instead of JSON lists: the browser decodes base64 straight into a
+# Float32Array, and the server writes one string instead of formatting every
+# number. float32 keeps ~7 significant digits, far more than the one or two
+# decimals the percentages carry
+def typed_array(values, dtype="f4"):
+    import numpy as np
+
+    array = np.ascontiguousarray(np.asarray(values, dtype=f"<{dtype}"))
+    spec = {"dtype": dtype, "bdata": base64.b64encode(array.data).decode("ascii")}
+    if array.ndim > 1:
+        spec["shape"] = ", ".join(str(n) for n in array.shape)
+    return spec
+
+
+# Dates as epoch milliseconds (float64, exact to the millisecond), which a
+# date axis reads directly; replaces one ISO string per point
+def date_array(dates):
+    import numpy as np
+
+    epoch_ms = np.asarray(dates, dtype="datetime64[ms]").astype(np.int64)
+    return typed_array(epoch_ms, dtype="f8")
@@ -0,0 +1,243 @@
+import bisect
+import contextlib
+import functools
+import os
+import threading
+import time
+
+# Metrics are collected only when METRICS_ENABLED=1. When disabled the
+# decorators hand back the original function and instrument() registers
+# nothing, so the request path is exactly what it was without them
+enabled = os.environ.get("METRICS_ENABLED", "0") == "1"
+
+# Bucket bounds: seconds for durations, bytes for payloads
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class Histogram:
+    # Prometheus-style histogram with one series per label set
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [
+                (key, list(counts), total)
+                for key, (counts, total) in self._series.items()
+            ]
+        for key, counts, total in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels(key, le=le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(key)} {cumulative}")
+        return lines
+
+
+class Counter:
+    # Prometheus-style counter with one series per label set
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    # Prometheus-style gauge with one series per label set
+    kind = "gauge"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(key)} {value}")
+        return lines
+
+
+def _labels(key, **extra):
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _get(name, factory):
+    metric = _registry.get(name)
+    if metric is None:
+        with _registry_lock:
+            metric = _registry.setdefault(name, factory())
+    return metric
+
+
+def histogram(name, help, buckets=DURATION_BUCKETS):
+    return _get(name, lambda: Histogram(name, help, buckets))
+
+
+def counter(name, help):
+    return _get(name, lambda: Counter(name, help))
+
+
+def gauge(name, help):
+    return _get(name, lambda: Gauge(name, help))
+
+
+def render():
+    # Text exposition format for the /metrics endpoint
+    lines = []
+    for name in sorted(_registry):
+        lines.extend(_registry[name].render())
+    return "\n".join(lines) + "\n"
+
+
+@contextlib.contextmanager
+def _timed_stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram(
+            "dashboard_stage_seconds", "Duration of data load pipeline stages"
+        ).observe(time.perf_counter() - start, stage=name)
+
+
+def stage(name):
+    # Time one stage of the data load pipeline: `with metrics.stage("melt"):`
+    if not enabled:
+        return contextlib.nullcontext()
+    return _timed_stage(name)
+
+
+def timed_callback(name):
+    # Decorator timing a Dash callback body; the function itself when disabled
+    def decorate(fn):
+        if not enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram(
+                    "dashboard_callback_seconds", "Duration of Dash callback bodies"
+                ).observe(time.perf_counter() - start, callback=name)
+
+        return wrapper
+
+    return decorate
+
+
+def count_cache(hit, tier="memory"):
+    if enabled:
+        counter(
+            "dashboard_cache_requests_total", "Figure and response cache lookups"
+        ).inc(result="hit" if hit else "miss", tier=tier)
+
+
+def record_dataset(source, dataset):
+    # Memory held by the current dataset of a source, one series per part
+    if enabled:
+        bytes_gauge = gauge(
+            "dashboard_dataset_bytes", "Memory held by the current dataset, per part"
+        )
+        for part, size in dataset.footprint().items():
+            bytes_gauge.set(size, source=source, part=part)
+
+
+def instrument(server):
+    # Time every Flask request (Dash callbacks included), record response
+    # sizes and serve the registry at /metrics
+    if not enabled or "dashboard_metrics" in server.extensions:
+        return server
+    # Several Dash apps can share one server; instrument it once
+    server.extensions["dashboard_metrics"] = True
+
+    from flask import g, request
+
+    @server.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        labels = {"route": route}
+        if route.endswith("_dash-update-component"):
+            # One series per callback rather than one for the whole dispatcher
+            body = request.get_json(silent=True) or {}
+            labels["callback"] = body.get("output", "")
+        histogram("dashboard_request_seconds", "Duration of HTTP requests").observe(
+            time.perf_counter() - start, **labels
+        )
+        if not response.direct_passthrough:
+            histogram(
+                "dashboard_response_bytes",
+                "Size of HTTP response bodies",
+                BYTES_BUCKETS,
+            ).observe(response.calculate_content_length() or 0, **labels)
+        return response
+
+    @server.route("/metrics")
+    def metrics_endpoint():
+        return server.response_class(render(), mimetype="text/plain; version=0.0.4")
+
+    return server
@@ -0,0 +1,176 @@
+import hashlib
+import importlib.metadata
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Shared on-disk cache for rendered figures and payloads. Off unless
+# CACHE_DIR names a directory; every worker on the node then opens the same
+# SQLite file, so a fresh worker (or a restart) serves what another built
+cache_dir = os.environ.get("CACHE_DIR")
+max_bytes = int(float(os.environ.get("CACHE_SIZE_MB", "256")) * 1024 * 1024)
+
+# Bump when the shape of cached values changes so old entries are not read
+FORMAT = 1
+
+# Seconds between access-time updates for one entry; keeps hot reads from
+# turning into a write per request while still ordering entries for LRU
+TOUCH_INTERVAL = 60
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries whose upgrade changes rendered output (asset URLs, figure JSON)
+LIBRARIES = ("dash", "plotly", "flask")
+
+_default = None
+_default_lock = threading.Lock()
+_release = None
+
+
+class DiskCache:
+    # Size-bounded LRU over one SQLite table, safe across threads and processes
+    def __init__(self, path, max_bytes=max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+            )
+
+    def _connect(self):
+        # One connection per thread and process; a forked worker opens its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, accessed FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, accessed = row
+        now = time.time()
+        if now - accessed > TOUCH_INTERVAL:
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        try:
+            return pickle.loads(value)
+        except Exception:
+            logger.warning("Dropping unreadable cache entry %s", key)
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+
+    def set(self, key, value):
+        # Plotly figures are stored as their plain dict: unpickling a Figure
+        # re-validates every property, which costs about as much as building it
+        if hasattr(value, "to_plotly_json"):
+            value = value.to_plotly_json()
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            logger.warning("Not caching %s: value cannot be pickled", key)
+            return False
+        if len(blob) > self.max_bytes:
+            return False
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, accessed)"
+            " VALUES (?, ?, ?, ?)",
+            (key, blob, len(blob), time.time()),
+        )
+        self._evict(conn)
+        return True
+
+    def _evict(self, conn):
+        # Drop least recently used entries until the table fits the budget
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        for key, size in conn.execute(
+            "SELECT key, size FROM entries ORDER BY accessed"
+        ).fetchall():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            excess -= size
+            if excess <= 0:
+                break
+
+    def stats(self):
+        entries, total = (
+            self._connect()
+            .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries")
+            .fetchone()
+        )
+        return {"entries": entries, "bytes": total, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries")
+
+
+def default_cache():
+    # The node-wide cache under CACHE_DIR, or None when disabled
+    global _default
+    if not cache_dir:
+        return None
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                os.makedirs(cache_dir, exist_ok=True)
+                _default = DiskCache(os.path.join(cache_dir, "cache.sqlite3"))
+    return _default
+
+
+def release():
+    # Fingerprint of the code that renders cached values: a deploy or library
+    # upgrade starts from fresh keys and the old entries age out through LRU
+    global _release
+    if _release is None:
+        sources = []
+        for folder, dirs, files in os.walk(ROOT):
+            dirs[:] = [d for d in dirs if not d.startswith((".", "__"))]
+            for name in files:
+                if name.endswith((".py", ".html")):
+                    path = os.path.join(folder, name)
+                    stat = os.stat(path)
+                    relative = os.path.relpath(path, ROOT)
+                    sources.append(f"{relative}:{stat.st_size}:{stat.st_mtime_ns}")
+        digest = hashlib.blake2b(";".join(sorted(sources)).encode(), digest_size=6)
+        for library in LIBRARIES:
+            try:
+                digest.update(importlib.metadata.version(library).encode())
+            except importlib.metadata.PackageNotFoundError:
+                pass
+        _release = digest.hexdigest()
+    return _release
+
+
+def make_key(namespace, version, key):
+    # Code release, dataset version and the caller's parameters, e.g.
+    # "1:3f2a9c0d41be:dash_heat:18dfefb2f718097b-454:('heatmap', 'monthly')"
+    return f"{FORMAT}:{release()}:{namespace}:{version}:{key!r}"
+
+
+def etag(version, *parts):
+    # Response ETag: the data version, the code release that encoded the body
+    # and anything else that picks its shape (e.g. a schema), so a deploy that
+    # changes a response never revalidates a browser's old copy to a 304
+    return "-".join([version, release()] + [str(part) for part in parts])
@@ -0,0 +1,149 @@
+import collections
+import cProfile
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+# Profiling is off unless PROFILE_DIR names a directory for the dumps. Then a
+# request runs under the profiler when it carries an "X-Profile: 1" header or
+# a "?profile=1" query flag, or when it is picked by PROFILE_SAMPLE=N (1 in N)
+profile_dir = os.environ.get("PROFILE_DIR")
+sample_every = int(os.environ.get("PROFILE_SAMPLE", "0"))
+
+# "cprofile" writes a pstats .prof file, "stack" samples the request thread
+# and writes collapsed stacks (.folded) for flamegraph.pl / speedscope
+mode = os.environ.get("PROFILE_MODE", "cprofile")
+STACK_INTERVAL = 0.001  # Seconds between stack samples
+
+_counter = itertools.count(1)
+_dumps = itertools.count(1)
+
+
+class StackSampler:
+    # py-spy style sampler: a background thread snapshots the target thread's
+    # stack at a fixed interval and counts identical stacks
+    def __init__(self, thread_id, interval=STACK_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                name = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({name}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-")[:60] or "root"
+
+
+def should_profile(request):
+    if request.headers.get("X-Profile") == "1" or request.args.get("profile") == "1":
+        return True
+    return sample_every > 0 and next(_counter) % sample_every == 0
+
+
+def request_tags(request):
+    # Route, callback ID and input values, enough to replay the request
+    tags = {
+        "route": request.url_rule.rule if request.url_rule else request.path,
+        "method": request.method,
+        "url": request.full_path,
+    }
+    body = request.get_json(silent=True)
+    if isinstance(body, dict) and "output" in body:
+        tags["callback"] = body["output"]
+        tags["inputs"] = {
+            f"{item['id']}.{item['property']}": item.get("value")
+            for item in body.get("inputs", []) + body.get("state", [])
+            if isinstance(item, dict) and "id" in item
+        }
+        tags["request"] = body
+    return tags
+
+
+def dump(tags, duration, profiler=None, sampler=None):
+    os.makedirs(profile_dir, exist_ok=True)
+    # e.g. 20250309-141502-4242-7-weekly-chart-figure
+    name = "-".join(
+        [
+            time.strftime("%Y%m%d-%H%M%S"),
+            str(os.getpid()),
+            str(next(_dumps)),
+            _slug(tags.get("callback") or tags["route"]),
+        ]
+    )
+    base = os.path.join(profile_dir, name)
+
+    tags = dict(tags, seconds=duration, mode=mode)
+    if profiler is not None:
+        profiler.dump_stats(base + ".prof")
+        tags["stats"] = name + ".prof"
+    if sampler is not None:
+        sampler.write(base + ".folded")
+        tags["stacks"] = name + ".folded"
+    with open(base + ".json", "w") as f:
+        json.dump(tags, f, indent=2, default=str)
+    return base
+
+
+def instrument(server):
+    # Profile selected requests on a Flask server (Dash apps pass app.server)
+    if not profile_dir or "dashboard_profiling" in server.extensions:
+        return server
+    # Several Dash apps can share one server; instrument it once
+    server.extensions["dashboard_profiling"] = True
+
+    from flask import g, request
+
+    @server.before_request
+    def start_profile():
+        if not should_profile(request):
+            return
+        g.profile_start = time.perf_counter()
+        if mode == "stack":
+            g.profile_sampler = StackSampler(threading.get_ident())
+            g.profile_sampler.start()
+        else:
+            g.profile = cProfile.Profile()
+            g.profile.enable()
+
+    @server.teardown_request
+    def stop_profile(error=None):
+        start = g.pop("profile_start", None)
+        if start is None:
+            return
+        profiler = g.pop("profile", None)
+        sampler = g.pop("profile_sampler", None)
+        if profiler is not None:
+            profiler.disable()
+        if sampler is not None:
+            sampler.stop()
+        dump(request_tags(request), time.perf_counter() - start, profiler, sampler)
+
+    return server
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from common.aggregate import fill
+from common.dates import date_labels
+
+# Zoom levels from finest to coarsest: (name, pandas period alias)
+LEVELS = [
+    ("daily", None),
+    ("weekly", "W"),
+    ("monthly", "M"),
+    ("quarterly", "Q"),
+]
+
+# Default tick label format per level
+LABEL_FORMATS = {
+    "weekly": "Wk %b %d",
+    "monthly": "%b %Y",
+    "quarterly": "Q%q %Y",
+}
+
+
+class Level:
+    # One region x bucket matrix of the pyramid
+    def __init__(self, name, z, starts, counts, periods, positions, labels):
+        self.name = name
+        self.z = z  # View into the pyramid buffer, regions x buckets
+        self.starts = starts  # First daily column of each bucket
+        self.counts = counts  # Daily columns per bucket
+        self.periods = periods  # PeriodIndex of the buckets (None for daily)
+        self.x = positions  # Bucket centre in daily column units
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class Pyramid:
+    # Daily, weekly, monthly and quarterly region x bucket matrices computed once
+    # from the base matrix and stored back to back in one contiguous buffer of
+    # `dtype` (the means are computed in float64 whatever it is)
+    def __init__(self, values, dates, labels=None, workers=None, dtype=float):
+        dates = pd.DatetimeIndex(dates)
+
+        # Sort the columns chronologically so every bucket is a run of adjacent columns
+        self.order = np.argsort(dates.values, kind="stable")
+        self.dates = dates[self.order]
+        base = np.asarray(values, dtype=float)[:, self.order]
+        if labels is None:
+            labels = date_labels(self.dates)
+        else:
+            labels = [labels[i] for i in self.order]
+
+        n_rows, n_cols = base.shape
+        positions = np.arange(n_cols, dtype=float)
+
+        # Bucket boundaries for every level
+        bounds = []
+        for name, period in LEVELS:
+            if period is None:
+                starts = np.arange(n_cols)
+                periods = None
+            else:
+                keys = self.dates.to_period(period)
+                starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+                periods = keys[starts]
+            bounds.append((name, starts, periods))
+
+        # One allocation for all levels, each level a contiguous slice of it
+        sizes = [len(starts) for _, starts, _ in bounds]
+        self.buffer = np.empty(n_rows * sum(sizes), dtype=dtype)
+        groups = [None if periods is None else starts for _, starts, periods in bounds]
+        matrices = fill(base, groups, self.buffer, sizes, workers)
+
+        self.levels = {}
+        for (name, starts, periods), z in zip(bounds, matrices):
+            counts = np.diff(np.r_[starts, n_cols])
+
+            if periods is None:
+                level_labels = labels
+            else:
+                # Weeks are labelled by the Monday they start on
+                level_labels = [
+                    (p.start_time if name == "weekly" else p).strftime(
+                        LABEL_FORMATS[name]
+                    )
+                    for p in periods
+                ]
+
+            self.levels[name] = Level(
+                name,
+                z,
+                starts,
+                counts,
+                periods,
+                np.add.reduceat(positions, starts) / counts if n_cols else positions,
+                level_labels,
+            )
+
+        self.names = [name for name, _ in LEVELS]
+
+    def __getitem__(self, name):
+        return self.levels[name]
+
+    def pick(self, max_buckets, span=None, finest="daily"):
+        # Finest level whose buckets over `span` daily columns fit the budget,
+        # e.g. max_buckets = chart width in px // minimum px per bucket
+        n_cols = len(self.dates)
+        span = n_cols if span is None else span
+        for name in self.names[self.names.index(finest) :]:
+            level = self.levels[name]
+            if span * len(level) <= max_buckets * n_cols:
+                return level
+        return self.levels[self.names[-1]]
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+# Largest k a caller may ask for
+MAX_K = 100
+
+
+class RankIndex:
+    # Regions ordered by value for every column of one region x bucket
+    # matrix, sorted once at load time so a top-k query is a slice
+    def __init__(self, z, labels, starts=None):
+        # Referenced, not copied: a float32 pyramid level stays float32
+        z = np.asarray(z)
+        self.z = z
+        self.labels = list(labels)
+        # First day of each bucket, for date lookups (labels only without it)
+        self.starts = None if starts is None else pd.DatetimeIndex(starts)
+
+        # Descending argsort of each column, stored one column per row so a
+        # query reads k adjacent entries; NaN (no data) sorts to the end
+        self.order = np.ascontiguousarray(
+            np.argsort(-z, axis=0, kind="stable").T.astype(np.int32)
+        )
+        self.valid = np.count_nonzero(~np.isnan(z), axis=0)
+        self.keys = {label: i for i, label in enumerate(self.labels)}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def column(self, date=None):
+        # Column for a label ("1/5", "Jan 2025") or any date inside a bucket
+        # ("2025-01-05"); the last column when no date is given
+        if not date:
+            return len(self) - 1
+        if date in self.keys:
+            return self.keys[date]
+        if self.starts is None:
+            return None
+        try:
+            when = pd.Timestamp(date)
+        except ValueError:
+            return None
+        i = self.starts.searchsorted(when, side="right") - 1
+        if i < 0 or (i == len(self) - 1 and when >= self.starts[-1] + self.span()):
+            return None
+        return int(i)
+
+    def span(self):
+        # Length of the last bucket, to tell a date inside it from one after it
+        if len(self) > 1:
+            return self.starts[-1] - self.starts[-2]
+        return pd.Timedelta(days=1)
+
+    def top(self, column, k):
+        # Rows of the k largest and k smallest values, O(k) per query
+        n = int(self.valid[column])
+        k = max(0, min(k, n))
+        ranked = self.order[column]
+        return ranked[:k], ranked[n - k : n][::-1]
+
+
+class Ranking:
+    # Rank indexes for the daily and monthly levels of a pyramid
+    def __init__(self, pyramid, regions, levels=("daily", "monthly")):
+        self.regions = list(regions)
+        self.levels = {}
+        for name in levels:
+            level = pyramid[name]
+            if level.periods is None:
+                starts = pyramid.dates
+            else:
+                starts = level.periods.to_timestamp()
+            self.levels[name] = RankIndex(level.z, level.labels, starts)
+
+    def __getitem__(self, name):
+        return self.levels[name]
+
+    def query(self, level="daily", date=None, k=5):
+        result = movers(self.levels[level], self.regions, date, k)
+        if result is not None:
+            result["level"] = level
+        return result
+
+
+# Top movers up and down for one date as a JSON-ready dict, or None for an
+# unknown date
+def movers(index, regions, date=None, k=5, decimals=1):
+    column = index.column(date)
+    if column is None:
+        return None
+    growth, decline = index.top(column, min(k, MAX_K))
+
+    def entries(rows):
+        # "+ 0.0" turns a rounded -0.0 into 0.0
+        return [
+            {
+                "region": regions[row],
+                "value": round(float(index.z[row, column]), decimals) + 0.0,
+            }
+            for row in rows
+        ]
+
+    return {
+        "date": index.labels[column],
+        "growth": entries(growth),
+        "decline": entries(decline),
+    }
@@ -0,0 +1,111 @@
+import importlib.util
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPS = [
+    "dash",
+    "dash_heat",
+    "dash_template",
+    "standardwebapp_enhanced",
+    "standardwebapp_template",
+    "host",
+]
+
+# Defaults for the production servers, each overridable from the environment
+DEFAULT_WORKERS = int(os.environ.get("WEB_WORKERS", 2 * (os.cpu_count() or 1) + 1))
+DEFAULT_THREADS = int(os.environ.get("WEB_THREADS", "4"))
+DEFAULT_KEEPALIVE = int(os.environ.get("WEB_KEEPALIVE", "5"))  # Seconds
+DEFAULT_TIMEOUT = int(os.environ.get("WEB_TIMEOUT", "60"))  # Seconds
+
+
+# Function to import an app's main.py by path; the "dash" folder would shadow
+# the dash package as a dotted import
+def load_app(app):
+    path = os.path.join(ROOT, app, "main.py")
+    name = f"{app}_main"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Flask and Dash resolve templates and assets from the registered module
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def wsgi_app(module):
+    # Dash apps expose their Flask server as `server`, Flask apps as `app`
+    server = getattr(module, "server", None)
+    if server is not None:
+        return server
+    return module.app
+
+
+def preload(module):
+    # Load data and render the cached responses once, before any fork, so
+    # every worker starts warm and shares the pages copy-on-write
+    if hasattr(module, "preload"):
+        module.preload()
+
+
+def after_fork(module):
+    store = getattr(module, "store", None)
+    if store is not None:
+        store.after_fork()
+
+
+def serve_dev(module, host, port):
+    # The Werkzeug development server, single-threaded, for comparison
+    wsgi_app(module).run(host=host, port=port, threaded=False, use_reloader=False)
+
+
+def serve_gunicorn(
+    module,
+    host,
+    port,
+    workers=DEFAULT_WORKERS,
+    threads=DEFAULT_THREADS,
+    keepalive=DEFAULT_KEEPALIVE,
+    timeout=DEFAULT_TIMEOUT,
+):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("gunicorn is not installed: pip install gunicorn")
+
+    application = wsgi_app(module)
+
+    class Application(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{host}:{port}",
+                "workers": workers,
+                "threads": threads,
+                # gthread keeps idle keep-alive connections off the worker threads
+                "worker_class": "gthread" if threads > 1 else "sync",
+                "keepalive": keepalive,
+                "timeout": timeout,
+                # The app (and its preloaded snapshot) is built once in the master
+                "preload_app": True,
+                "post_fork": lambda server, worker: after_fork(module),
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return application
+
+    Application().run()
+
+
+def serve_waitress(module, host, port, threads=DEFAULT_THREADS):
+    # Single process, thread pool; the option on Windows where gunicorn is absent
+    try:
+        import waitress
+    except ImportError:
+        raise SystemExit("waitress is not installed: pip install waitress")
+
+    waitress.serve(wsgi_app(module), host=host, port=port, threads=threads)
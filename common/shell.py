@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+
+# Pre-rendered page shell for the Dash apps. The index page is rendered once
+# per dataset version with the layout (initial figure included) and the
+# callback graph inlined, so the first chart paints from a single HTML
+# response instead of index -> _dash-layout -> _dash-dependencies -> callback.
+# DASH_SHELL=0 serves Dash's own index page instead
+enabled = os.environ.get("DASH_SHELL", "1") == "1"
+
+# Seconds a browser may reuse the shell without revalidating. The default of
+# 0 revalidates every load, which is a 304 until the dataset version changes
+max_age = int(os.environ.get("DASH_SHELL_MAX_AGE", "0"))
+
+# Answers the renderer's first _dash-layout / _dash-dependencies fetches from
+# the inlined JSON; later fetches (hot reload, navigation) go to the server
+SHIM = """<script id="_dash-shell" type="application/json">PAYLOAD</script>
+<script>
+(function () {
+    var shell = JSON.parse(document.getElementById("_dash-shell").textContent);
+    var fetch = window.fetch;
+    window.fetch = function (input, init) {
+        var url = typeof input === "string" ? input : input.url;
+        var path = url.split("?")[0];
+        var key = /_dash-layout$/.test(path) ? "layout"
+            : /_dash-dependencies$/.test(path) ? "dependencies" : null;
+        if (key && shell[key]) {
+            var body = shell[key];
+            shell[key] = null;
+            return Promise.resolve(new Response(body, {
+                status: 200,
+                headers: {"Content-Type": "application/json"}
+            }));
+        }
+        return fetch.apply(this, arguments);
+    };
+})();
+</script>
+"""
+
+
+def _script_safe(text):
+    # JSON inside a <script> element must not close the element early
+    return text.replace("</", "<\\/")
+
+
+def render(app):
+    # Dash's index page with the layout and callback graph inlined; must run
+    # inside a request so the layout function sees the current snapshot
+    layout = app.serve_layout().get_data(as_text=True)
+    dependencies = app.dependencies().get_data(as_text=True)
+    payload = json.dumps({"layout": layout, "dependencies": dependencies})
+    shim = SHIM.replace("PAYLOAD", _script_safe(payload))
+
+    index = app.index()
+    marker = '<script id="_dash-config"'
+    if marker in index:
+        return index.replace(marker, shim + marker, 1)
+    return index.replace("</body>", shim + "</body>", 1)
+
+
+def instrument(app, store):
+    # Serve the cached shell for GETs of the app's root page
+    if not enabled:
+        return app
+
+    from flask import request
+
+    server = app.server
+    root = app.config.requests_pathname_prefix
+
+    @server.before_request
+    def serve_shell():
+        if request.method != "GET" or request.path != root:
+            return None
+        snapshot = store.current
+        body, etag = snapshot.cached(("shell", root), lambda: _build(app, snapshot))
+        response = server.response_class(body, mimetype="text/html")
+        response.set_etag(etag)
+        if max_age > 0:
+            response.headers["Cache-Control"] = f"public, max-age={max_age}"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
+    return app
+
+
+def warm(app):
+    # Render the shell for the current version ahead of the first visitor
+    if enabled:
+        app.server.test_client().get(app.config.requests_pathname_prefix)
+    return app
+
+
+def _build(app, snapshot):
+    body = render(app)
+    # Version plus content hash: a code deploy changes the page too
+    digest = hashlib.blake2b(body.encode("utf-8"), digest_size=8).hexdigest()
+    return body, f"{snapshot.version}-{digest}"
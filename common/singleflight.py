@@ -0,0 +1,43 @@
+import threading
+
+
+class _Call:
+    # One in-flight build and the threads waiting on it
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Coalesces concurrent builds of the same key: the first caller computes,
+    # every caller arriving meanwhile waits and gets the same result (or error)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.builds = 0  # Builds actually run, handy to check coalescing
+
+    def do(self, key, build):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.builds += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = build()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
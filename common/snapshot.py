@@ -0,0 +1,215 @@
+import logging
+import os
+import threading
+
+from common import metrics, persist
+from common.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    # Everything derived from one version of the data file. Built once, never
+    # mutated afterwards apart from the figure/response cache, which is keyed
+    # per snapshot. A namespace (the app name) also makes the cache persist to
+    # the shared on-disk cache when CACHE_DIR is set
+    def __init__(self, version, namespace=None, **parts):
+        self.version = version
+        self.namespace = namespace
+        self.cache = {}
+        self._flight = SingleFlight()
+        for name, value in parts.items():
+            setattr(self, name, value)
+
+    def cached(self, key, build):
+        # Cached figure or payload for this version. Concurrent misses for the
+        # same key are coalesced so a burst after a reload builds it only once
+        value = self.cache.get(key)
+        metrics.count_cache(value is not None)
+        if value is not None:
+            return value
+        return self._flight.do(key, lambda: self._build(key, build))
+
+    def _build(self, key, build):
+        # A caller that missed just before the previous build finished
+        value = self.cache.get(key)
+        if value is None:
+            value = self.cache[key] = self._load(key, build)
+        return value
+
+    def _load(self, key, build):
+        # Shared on-disk cache first; only for a known data version ("0" means
+        # the source has no change marker, so the entry could go stale)
+        disk = persist.default_cache()
+        if disk is None or self.namespace is None or self.version == "0":
+            return build()
+        disk_key = persist.make_key(self.namespace, self.version, key)
+        value = disk.get(disk_key)
+        metrics.count_cache(value is not None, tier="disk")
+        if value is None:
+            value = build()
+            disk.set(disk_key, value)
+        return value
+
+
+class SnapshotStore:
+    # Holds the current snapshot and replaces it when the data source changes.
+    # Rebuilds happen on the watcher thread; readers only ever see a complete
+    # snapshot because the swap is a single reference assignment. A lazy store
+    # loads the first snapshot on first use (or in an explicit preload) so
+    # importing an app stays cheap
+    def __init__(self, source, build, interval=None, lazy=False):
+        self.source = source
+        self.build = build  # build(source, version) -> Snapshot
+        if interval is None:
+            interval = float(os.environ.get("DATA_RELOAD_INTERVAL", "5"))
+        self.interval = interval
+        self._current = None
+        self._stamp = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if not lazy:
+            self.load()
+
+    @property
+    def current(self):
+        snapshot = self._current
+        if snapshot is None:
+            snapshot = self.load()
+        return snapshot
+
+    @property
+    def version(self):
+        return self.current.version
+
+    def load(self):
+        # First snapshot; concurrent first requests wait for one build
+        with self._load_lock:
+            if self._current is None:
+                self._stamp = self.source.stamp()
+                self._current = self.build(self.source, self._version(self._stamp))
+        return self._current
+
+    def _version(self, stamp):
+        # Content hash of the data when the source can produce one, so the
+        # version (and every cache key and ETag built on it) follows the bytes
+        # rather than an mtime; the stamp only decides when to hash again
+        if stamp is None:
+            return "0"
+        fingerprint = self.source.fingerprint()
+        if fingerprint is not None:
+            return fingerprint
+        return "{:x}-{:x}".format(*stamp)
+
+    def reload_if_changed(self):
+        if self._current is None:
+            # Nothing loaded yet, the first use picks up the latest data anyway
+            return False
+        try:
+            stamp = self.source.stamp()
+        except OSError:
+            logger.warning("Data source not readable: %s", self.source.name)
+            return False
+        if stamp == self._stamp:
+            return False
+
+        try:
+            version = self._version(stamp)
+        except OSError:
+            logger.warning("Data source not readable: %s", self.source.name)
+            return False
+        if version == self._current.version:
+            # Touched or rewritten with the same bytes: nothing to rebuild
+            self._stamp = stamp
+            logger.info("%s changed on disk but not in content", self.source.name)
+            return False
+
+        try:
+            snapshot = self.build(self.source, version)
+        except Exception:
+            # Keep serving the previous snapshot, e.g. while the file is half written
+            logger.exception("Reload of %s failed", self.source.name)
+            return False
+
+        self._stamp = stamp
+        self._current = snapshot
+        logger.info("Reloaded %s as version %s", self.source.name, snapshot.version)
+        return True
+
+    def start(self):
+        # Poll the source on a daemon thread; an interval of 0 disables reloading,
+        # as does a source without a change marker
+        if self.interval <= 0 or self._thread is not None:
+            return self
+        try:
+            if self.source.stamp() is None:
+                return self
+        except OSError:
+            pass
+        self._thread = threading.Thread(
+            target=self._watch, name="snapshot-watcher", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def after_fork(self):
+        # Threads do not survive fork(): a worker forked from a preloaded
+        # master keeps the snapshot but starts its own watcher
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        return self.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self.reload_if_changed()
+
+
+# Function to point an app module at a store shared with other dashboards
+# (see host/main.py) or at another source, stopping its own watcher
+def use_store(module, store):
+    module.store.stop()
+    module.store = store
+
+
+# Function to get the snapshot a Dash layout function renders from. Dash also
+# calls the layout once at startup to validate it; outside a request this
+# returns None and the app renders its skeleton (with PLACEHOLDER_FIGURE from
+# common/figures.py) without loading the data
+def layout_snapshot(store):
+    from flask import has_request_context
+
+    if not has_request_context():
+        return None
+    return store.current
+
+
+class StoreView:
+    # One dashboard's part of a snapshot shared by several (see host/main.py).
+    # Reads like a SnapshotStore, so the app code is the same either way
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+
+    @property
+    def source(self):
+        return self.store.source
+
+    @property
+    def current(self):
+        return getattr(self.store.current, self.name)
+
+    @property
+    def version(self):
+        return self.store.version
+
+    def stop(self):
+        pass
+
+    def after_fork(self):
+        # The shared store is restarted once by its owner
+        return self
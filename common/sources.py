@@ -0,0 +1,195 @@
+import hashlib
+import logging
+import os
+import time
+
+# pandas is imported where it is used so that importing an app stays cheap
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+# Rows per chunk when a source is read incrementally
+DEFAULT_CHUNKSIZE = 10000
+
+# Bytes per read when hashing a file; large blocks keep hashing at disk speed
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class DataSource:
+    # Where a dashboard's region x date table comes from. Sources yield the
+    # table in chunks so a loader never needs the whole raw read in one piece
+    name = "source"
+
+    def __init__(self, columns=None, chunksize=DEFAULT_CHUNKSIZE):
+        self.columns = columns  # None reads every column
+        self.chunksize = chunksize
+        self.stats = {}
+
+    def iter_frames(self):
+        raise NotImplementedError
+
+    def stamp(self):
+        # Cheap change marker for the reload watcher, None when unknown
+        return None
+
+    def fingerprint(self):
+        # Content hash used as the data version, None when unknown
+        return None
+
+
+class LocalSource(DataSource):
+    # CSV or Parquet file on local disk; stands in for Dataiku in tests and dev
+    def __init__(self, path, columns=None, chunksize=DEFAULT_CHUNKSIZE):
+        super().__init__(columns, chunksize)
+        self.path = path
+        self.name = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def fingerprint(self):
+        return file_fingerprint(self.path)
+
+    def iter_frames(self):
+        import pandas as pd
+
+        if self.path.endswith(".parquet"):
+            yield from self._iter_parquet()
+            return
+
+        # usecols keeps pruned columns out of the parser entirely
+        yield from pd.read_csv(
+            self.path, header=0, usecols=self.columns, chunksize=self.chunksize
+        )
+
+    def _iter_parquet(self):
+        import pandas as pd
+
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            yield pd.read_parquet(self.path, columns=self.columns)
+            return
+
+        parquet = pq.ParquetFile(self.path)
+        for batch in parquet.iter_batches(
+            batch_size=self.chunksize, columns=self.columns
+        ):
+            yield batch.to_pandas()
+
+
+class DataikuSource(DataSource):
+    # Managed Dataiku dataset read chunk by chunk, with column and partition pruning
+    def __init__(
+        self, dataset, columns=None, partitions=None, chunksize=DEFAULT_CHUNKSIZE
+    ):
+        super().__init__(columns, chunksize)
+        self.dataset = dataset
+        self.partitions = partitions or []
+        self.name = f"dataiku:{dataset}"
+
+    def iter_frames(self):
+        import dataiku
+
+        dataset = dataiku.Dataset(self.dataset)
+        for partition in self.partitions:
+            dataset.add_read_partitions(partition)
+        yield from dataset.iter_dataframes(
+            chunksize=self.chunksize, columns=self.columns, infer_with_pandas=True
+        )
+
+
+class FrameSource(DataSource):
+    # A frame already in memory, e.g. one read shared by several dashboards.
+    # Each reader gets a shallow copy-on-write copy, so one renaming columns
+    # or replacing a column does not affect the others
+    def __init__(self, frame, name="frame"):
+        super().__init__(list(frame.columns))
+        self.frame = frame
+        self.name = name
+
+    def iter_frames(self):
+        yield self.frame.copy(deep=False)
+
+
+def _hasher():
+    # xxh3 when installed (several GB/s), blake2b from the standard library
+    # otherwise; both stream, so memory stays at one block
+    try:
+        import xxhash
+    except ImportError:
+        return hashlib.blake2b(digest_size=16)
+    return xxhash.xxh3_128()
+
+
+def file_fingerprint(path, block_size=HASH_BLOCK_SIZE):
+    # Hash the raw bytes in large blocks, without parsing anything
+    start = time.perf_counter()
+    digest = _hasher()
+    size = 0
+    with open(path, "rb", buffering=0) as f:
+        # No bigger than the file, so small files skip the large allocation
+        buffer = bytearray(max(1, min(block_size, os.fstat(f.fileno()).st_size)))
+        view = memoryview(buffer)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+            size += n
+    elapsed = time.perf_counter() - start
+    logger.info(
+        "Hashed %d bytes of %s in %.3fs (%.0f MB/s)",
+        size,
+        path,
+        elapsed,
+        size / elapsed / 1e6 if elapsed > 0 else float("inf"),
+    )
+    return digest.hexdigest()
+
+
+def make_source(path, columns=None):
+    # Dataiku dataset when DATAIKU_DATASET is set, otherwise the local file
+    dataset = os.environ.get("DATAIKU_DATASET")
+    if dataset:
+        partitions = [
+            p for p in os.environ.get("DATAIKU_PARTITIONS", "").split(",") if p
+        ]
+        return DataikuSource(dataset, columns=columns, partitions=partitions)
+    return LocalSource(path, columns=columns)
+
+
+def load_frame(source):
+    # Read every chunk of a source into one frame and record the throughput
+    import pandas as pd
+
+    start = time.perf_counter()
+    with metrics.stage("load"):
+        chunks = list(source.iter_frames())
+    if chunks:
+        df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    else:
+        df = pd.DataFrame(columns=source.columns or [])
+    elapsed = time.perf_counter() - start
+
+    source.stats = {
+        "rows": len(df),
+        "columns": len(df.columns),
+        "chunks": len(chunks),
+        "seconds": elapsed,
+        "rows_per_sec": len(df) / elapsed if elapsed > 0 else float("inf"),
+    }
+    logger.info(
+        "Loaded %d rows x %d columns from %s in %.3fs (%.0f rows/s)",
+        len(df),
+        len(df.columns),
+        source.name,
+        elapsed,
+        source.stats["rows_per_sec"],
+    )
+    return df
@@ -1,18 +1,27 @@
 # import dataiku
+import os
+import sys
 import dash
-from dash import dcc, html, dash_table
-from dash.dependencies import Input, Output, State
-import pandas as pd
-from datetime import datetime
-
-# Initialize Dash app with custom styles
-app = dash.Dash(
-    __name__,
-    meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}],
+from dash import dcc, html
+from dash.dependencies import Input, Output
+
+# Make the shared data layer importable when running from the app folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import metrics, profiling, shell  # noqa: E402
+from common.figures import (  # noqa: E402
+    PLACEHOLDER_FIGURE,
+    date_array,
+    sign_marker,
+    typed_array,
 )
+from common.snapshot import Snapshot, SnapshotStore, layout_snapshot  # noqa: E402
+from common.sources import make_source  # noqa: E402
+
+# pandas and the pyramid are imported inside the functions that use them, so
+# importing this module (and booting a worker) stays cheap
 
 # Custom CSS for ExampleDash-like styling
-app.index_string = """
+INDEX_STRING = """
 <!DOCTYPE html>
 <html>
     <head>
@@ -132,295 +141,563 @@ app.index_string = """
 </html>
 """
 
-# Load data from CSV with the first row as header
-df = pd.read_csv("dash/data.csv", header=0)
 
-# Prepare data for table and graph
-dates = df.columns[1:]  # Exclude region column
-regions = df.iloc[:, 0].tolist()  # First column as regions
+# Build every derived frame and index for one version of the data file
+def build_snapshot(source, version):
+    from common.dataset import prepare
+    from common.derived import Derived
+    from common.ranking import Ranking
 
-# Add the current year to the date columns for proper parsing
-current_year = datetime.now().year
-df.columns = ["Region"] + [f"{d}/{current_year}" for d in dates]
+    # The cleaned values, their float32 daily/weekly/monthly/quarterly
+    # pyramid and the dataset over it, built once per version (shared under
+    # host/main.py). Callbacks read the dataset only
+    data = prepare(source, version)
+    pyramid = data.pyramid
+    dataset = data.dataset
 
-# Convert to long format for plotting
-plot_df = df.copy()
-plot_df = plot_df.melt(id_vars=["Region"], var_name="Date", value_name="Change")
+    with metrics.stage("derived"):
+        # Rolling means and per-region ranges for every level, looked up by
+        # the figures instead of computed per request
+        derived = Derived(pyramid)
+        # Regions sorted per day and per month, for the top movers panel
+        ranking = Ranking(pyramid, data.regions)
 
-# Clean the "Change" column to ensure it contains numeric values
-plot_df["Change"] = plot_df["Change"].str.replace("%", "", regex=False).astype(float)
+    snapshot = Snapshot(
+        version,
+        namespace="dash",
+        dataset=dataset,
+        derived=derived,
+        ranking=ranking,
+    )
 
-# Convert dates to datetime objects for proper sorting
-plot_df["Date"] = pd.to_datetime(plot_df["Date"], format="%m/%d/%Y")
+    # Render the default figure off the request path
+    snapshot.cached(
+        ("Global", "daily"), lambda: create_figure(snapshot, "Global", "daily")
+    )
+    return snapshot
 
-# Sort by date to ensure chronological order
-plot_df = plot_df.sort_values("Date")
 
-# Create a monthly aggregated dataframe
-monthly_df = plot_df.copy()
-monthly_df["Month"] = monthly_df["Date"].dt.strftime("%Y-%m")
-monthly_df = (
-    monthly_df.groupby(["Region", "Month"]).agg({"Change": "mean"}).reset_index()
-)
-monthly_df["Date"] = pd.to_datetime(
-    monthly_df["Month"] + "-15"
-)  # Set to middle of month for display
+# Function to build the shared chart layout for a view
+def figure_layout(view_type="daily"):
+    return {
+        "paper_bgcolor": "#fffdf5",
+        "plot_bgcolor": "#fffdf5",
+        "margin": {"l": 50, "r": 30, "t": 10, "b": 50},
+        "xaxis": {
+            # x values are epoch milliseconds, so the axis type is not inferred
+            "type": "date",
+            "showgrid": False,
+            "zeroline": False,
+            "title": "",
+            "tickfont": {"size": 12, "color": "#555"},
+            "tickformat": (
+                "%b %d" if view_type == "daily" else "%b %Y"
+            ),  # Format based on view
+            "tickangle": -45,
+        },
+        "yaxis": {
+            "showgrid": True,
+            "gridcolor": "#f0f0f0",
+            "zeroline": True,
+            "zerolinecolor": "#e0e0e0",
+            "title": "% Change",
+            "titlefont": {"size": 14, "color": "#555"},
+            "ticksuffix": "%",
+            "tickfont": {"size": 12, "color": "#555"},
+            # float32 values hover as their two decimals, not 12.300000190734863
+            "hoverformat": ".2~f",
+        },
+        "hovermode": "closest",
+        "hoverlabel": {
+            "bgcolor": "white",
+            "font": {"color": "#333"},
+            "bordercolor": "#ddd",
+        },
+    }
 
 
 # Function to create the figure with ExampleDash styling
-def create_figure(data, selected_region, view_type="daily"):
-    # Filter data for the selected region
-    if view_type == "daily":
-        filtered_data = data[data["Region"] == selected_region]
-    else:  # monthly view
-        filtered_data = monthly_df[monthly_df["Region"] == selected_region]
+def create_figure(snapshot, selected_region, view_type="daily"):
+    import numpy as np
+    from common.derived import SUMMARY_FIELDS
+
+    # One row of the daily or pre-aggregated monthly matrix
+    row = snapshot.dataset.row(selected_region)
+    dates, values = snapshot.dataset.series(selected_region, view_type)
+
+    # Precomputed rolling mean and range for this region and view
+    derived = snapshot.derived[view_type]
+    summary = derived.summary[row]
+    unit = "day" if view_type == "daily" else "month"
+
+    # Dates and values go out as typed arrays (see common/figures.py)
+    y = typed_array(values)
 
     # Create a custom figure
     figure = {
         "data": [
             {
-                "x": filtered_data["Date"],
-                "y": filtered_data["Change"],
+                "x": date_array(dates),
+                "y": y,
                 "type": "scatter",
                 "mode": "lines+markers",
                 "name": selected_region,
-                "line": {
-                    "color": [
-                        "#2ecc71" if val >= 0 else "#e74c3c"
-                        for val in filtered_data["Change"]
-                    ],
-                    "width": 2,
-                    "shape": "spline",
-                },
-                "marker": {
-                    "color": [
-                        "#2ecc71" if val >= 0 else "#e74c3c"
-                        for val in filtered_data["Change"]
-                    ],
-                    "size": 8,
-                },
+                "line": {"width": 2, "shape": "spline"},
+                "marker": sign_marker(y),
                 "fill": "tozeroy",
                 "fillcolor": "rgba(46, 204, 113, 0.1)",
-            }
-        ],
-        "layout": {
-            "paper_bgcolor": "#fffdf5",
-            "plot_bgcolor": "#fffdf5",
-            "margin": {"l": 50, "r": 30, "t": 10, "b": 50},
-            "xaxis": {
-                "showgrid": False,
-                "zeroline": False,
-                "title": "",
-                "tickfont": {"size": 12, "color": "#555"},
-                "tickformat": (
-                    "%b %d" if view_type == "daily" else "%b %Y"
-                ),  # Format based on view
-                "tickangle": -45,
             },
-            "yaxis": {
-                "showgrid": True,
-                "gridcolor": "#f0f0f0",
-                "zeroline": True,
-                "zerolinecolor": "#e0e0e0",
-                "title": "% Change",
-                "titlefont": {"size": 14, "color": "#555"},
-                "ticksuffix": "%",
-                "tickfont": {"size": 12, "color": "#555"},
-            },
-            "hovermode": "closest",
-            "hoverlabel": {
-                "bgcolor": "white",
-                "font": {"color": "#333"},
-                "bordercolor": "#ddd",
+            {
+                "x": date_array(dates),
+                "y": typed_array(derived.rolling[row]),
+                "type": "scatter",
+                "mode": "lines",
+                "name": f"{derived.window}-{unit} average",
+                "line": {"width": 2, "color": "#2c3e50", "dash": "dot"},
             },
-        },
+        ],
+        "layout": figure_layout(view_type),
+    }
+
+    # Shade the region's typical range (10th to 90th percentile of the view)
+    low = float(summary[SUMMARY_FIELDS.index("p10")])
+    high = float(summary[SUMMARY_FIELDS.index("p90")])
+    if not np.isnan(low):
+        figure["layout"]["shapes"] = [
+            {
+                "type": "rect",
+                "xref": "paper",
+                "x0": 0,
+                "x1": 1,
+                "yref": "y",
+                "y0": low,
+                "y1": high,
+                "fillcolor": "rgba(44, 62, 80, 0.06)",
+                "line": {"width": 0},
+                "layer": "below",
+            }
+        ]
+    figure["layout"]["showlegend"] = True
+    figure["layout"]["legend"] = {
+        "orientation": "h",
+        "y": 1.08,
+        "x": 1,
+        "xanchor": "right",
     }
+    figure["layout"]["margin"] = dict(figure["layout"]["margin"], t=40)
 
     return figure
 
 
-# Layout
-app.layout = html.Div(
-    [
-        # Header
-        html.Div(
-            [
-                html.Div(
-                    [
-                        html.H1(
-                            "Change in seated diners by month / day, 2025 vs. 2024"
-                        ),
-                        html.P(
-                            "This table measures the volume of seated diners from online reservations on a daily/monthly basis in 2025 vs. "
-                            "2024. For example, in Los Angeles on January 4, 2025, seated diners were up 3% compared to 2024. In the "
-                            "monthly view, data for the current month shows the YoY change in seated diners for the month-to-date. For "
-                            "example, if the date is January 10, 2025, the data compares January 1 - 10, 2025 to the same range in 2024."
-                        ),
-                    ],
-                    className="container",
-                )
-            ],
-            className="header",
-        ),
-        # Main content
-        html.Div(
+# One colour per compared region, cycled when there are more regions
+COMPARE_COLORS = [
+    "#2c3e50",
+    "#e67e22",
+    "#2980b9",
+    "#8e44ad",
+    "#16a085",
+    "#c0392b",
+    "#7f8c8d",
+    "#d35400",
+    "#27ae60",
+    "#f1c40f",
+]
+
+
+# Function to overlay several regions, one trace each, from one gather
+def create_comparison_figure(snapshot, regions, view_type="daily"):
+    import numpy as np
+    import pandas as pd
+
+    dataset = snapshot.dataset
+    if view_type == "daily":
+        matrix = dataset.values
+        dates = dataset.dates
+    else:  # monthly view, set to middle of month for display
+        matrix = dataset.monthly
+        dates = dataset.months.to_timestamp() + pd.Timedelta(days=14)
+
+    # A single fancy-index pulls every selected row out of the region x date
+    # matrix; the traces below only slice it
+    rows = np.array([dataset.row(region) for region in regions])
+    values = matrix[rows]
+    x = date_array(dates)
+
+    traces = [
+        {
+            "x": x,
+            "y": typed_array(values[i]),
+            "type": "scatter",
+            "mode": "lines" if view_type == "daily" else "lines+markers",
+            "name": region,
+            "line": {
+                "color": COMPARE_COLORS[i % len(COMPARE_COLORS)],
+                "width": 2,
+            },
+        }
+        for i, region in enumerate(regions)
+    ]
+
+    layout = figure_layout(view_type)
+    layout["hovermode"] = "x unified"
+    layout["showlegend"] = True
+    layout["legend"] = {"orientation": "h", "y": -0.25}
+    layout["margin"] = dict(layout["margin"], b=90)
+    return {"data": traces, "layout": layout}
+
+
+# Number of regions listed each way in the top movers panel
+TOP_MOVERS = 5
+
+
+# Function to render the top movers panel from a ranking query
+def render_movers(result):
+    if result is None:
+        return html.P("No data for this date", style={"color": "#777"})
+
+    def column(title, entries, color):
+        return html.Div(
             [
-                # Region dropdown
-                html.Div(
-                    [
-                        # Dropdown container with relative positioning
-                        html.Div(
-                            [
-                                dcc.Dropdown(
-                                    id="region-select",
-                                    options=[
-                                        {"label": region, "value": region}
-                                        for region in regions
-                                    ],
-                                    value="Global",
-                                    style={
-                                        "width": "200px",
-                                        "paddingRight": "5px",  # Add padding for the caret
-                                    },
-                                    clearable=False,
-                                ),
-                            ],
-                            style={
-                                "position": "relative",
-                                "display": "inline-block",
-                                "marginRight": "20px",
-                            },
-                        ),
-                        # View dropdown container with relative positioning
-                        html.Div(
-                            [
-                                dcc.Dropdown(
-                                    id="view-select",
-                                    options=[
-                                        {"label": "Daily", "value": "daily"},
-                                        {"label": "Monthly", "value": "monthly"},
-                                    ],
-                                    value="daily",
-                                    style={
-                                        "width": "200px",
-                                        "paddingRight": "5px",  # Add padding for the caret
-                                    },
-                                    clearable=False,
-                                ),
-                            ],
-                            style={
-                                "position": "relative",
-                                "display": "inline-block",
-                            },
-                        ),
-                    ],
-                    className="dropdown-container",
-                ),
-                # Chart container
-                html.Div(
+                html.H4(title, style={"margin": "0 0 8px", "color": "#333"}),
+                html.Ol(
                     [
-                        # Legend
-                        html.Div(
+                        html.Li(
                             [
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            style={
-                                                "width": "30px",
-                                                "height": "4px",
-                                                "backgroundColor": "#e74c3c",
-                                                "marginRight": "8px",
-                                            }
-                                        ),
-                                        html.Div(
-                                            "Decline",
-                                            style={
-                                                "fontSize": "0.9em",
-                                                "color": "#555",
-                                            },
-                                        ),
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "alignItems": "center",
-                                        "marginLeft": "20px",
-                                    },
-                                ),
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            style={
-                                                "width": "30px",
-                                                "height": "4px",
-                                                "backgroundColor": "#2ecc71",
-                                                "marginRight": "8px",
-                                            }
-                                        ),
-                                        html.Div(
-                                            "Growth",
-                                            style={
-                                                "fontSize": "0.9em",
-                                                "color": "#555",
-                                            },
-                                        ),
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "alignItems": "center",
-                                        "marginLeft": "20px",
-                                    },
-                                ),
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            "2025 vs. 2024",
-                                            style={
-                                                "fontSize": "0.9em",
-                                                "color": "#555",
-                                            },
-                                        )
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "alignItems": "center",
-                                        "marginLeft": "20px",
-                                    },
+                                html.Span(entry["region"]),
+                                html.Span(
+                                    f" {entry['value']:+g}%",
+                                    style={"color": color, "fontWeight": 600},
                                 ),
-                            ],
-                            style={
-                                "display": "flex",
-                                "alignItems": "center",
-                                "justifyContent": "flex-end",
-                                "marginBottom": "15px",
-                            },
-                        ),
-                        # Chart
-                        dcc.Graph(
-                            id="weekly-chart",
-                            figure=create_figure(plot_df, "Global", "daily"),
-                            config={"displayModeBar": False},
-                            style={"height": "400px"},
-                        ),
-                        # Table (hidden by default)
-                        html.Div(id="table-container", style={"display": "none"}),
+                            ]
+                        )
+                        for entry in entries
                     ],
-                    className="chart-container",
+                    style={"margin": 0, "paddingLeft": "20px"},
                 ),
             ],
-            className="container",
-        ),
-    ]
-)
+            style={"flex": 1},
+        )
 
+    return html.Div(
+        [
+            html.P(
+                f"Top movers, {result['date']} (click the chart to pick a date)",
+                style={"fontSize": "0.9em", "color": "#555", "margin": "0 0 10px"},
+            ),
+            html.Div(
+                [
+                    column("Largest growth", result["growth"], "#2ecc71"),
+                    column("Largest decline", result["decline"], "#e74c3c"),
+                ],
+                style={"display": "flex", "gap": "40px"},
+            ),
+        ]
+    )
+
+
+# Current snapshot of the data file, loaded on first use and rebuilt in the
+# background when it changes
+store = SnapshotStore(make_source("dash/data.csv"), build_snapshot, lazy=True).start()
+
+
+# Layout, rebuilt on every page load so it follows the current snapshot
+def serve_layout():
+    # Outside a request (Dash validating the layout) there is no snapshot
+    snapshot = layout_snapshot(store)
+    if snapshot is not None:
+        regions = snapshot.dataset.regions
+        figure = snapshot.cached(
+            ("Global", "daily"), lambda: create_figure(snapshot, "Global", "daily")
+        )
+        movers = render_movers(snapshot.ranking.query("daily", k=TOP_MOVERS))
+    else:
+        regions = []
+        figure = PLACEHOLDER_FIGURE
+        movers = None
+    return html.Div(
+        [
+            # Header
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            html.H1(
+                                "Change in seated diners by month / day, 2025 vs. 2024"
+                            ),
+                            html.P(
+                                "This table measures the volume of seated diners from online reservations on a daily/monthly basis in 2025 vs. "
+                                "2024. For example, in Los Angeles on January 4, 2025, seated diners were up 3% compared to 2024. In the "
+                                "monthly view, data for the current month shows the YoY change in seated diners for the month-to-date. For "
+                                "example, if the date is January 10, 2025, the data compares January 1 - 10, 2025 to the same range in 2024."
+                            ),
+                        ],
+                        className="container",
+                    )
+                ],
+                className="header",
+            ),
+            # Main content
+            html.Div(
+                [
+                    # Region dropdown
+                    html.Div(
+                        [
+                            # Dropdown container with relative positioning
+                            html.Div(
+                                [
+                                    dcc.Dropdown(
+                                        id="region-select",
+                                        options=[
+                                            {"label": region, "value": region}
+                                            for region in regions
+                                        ],
+                                        value="Global",
+                                        style={
+                                            "width": "200px",
+                                            "paddingRight": "5px",  # Add padding for the caret
+                                        },
+                                        clearable=False,
+                                    ),
+                                ],
+                                style={
+                                    "position": "relative",
+                                    "display": "inline-block",
+                                    "marginRight": "20px",
+                                },
+                            ),
+                            # Regions to overlay on the chart (comparison mode)
+                            html.Div(
+                                [
+                                    dcc.Dropdown(
+                                        id="compare-select",
+                                        options=[
+                                            {"label": region, "value": region}
+                                            for region in regions
+                                        ],
+                                        value=[],
+                                        multi=True,
+                                        placeholder="Compare with...",
+                                        style={"minWidth": "260px"},
+                                    ),
+                                ],
+                                style={
+                                    "position": "relative",
+                                    "display": "inline-block",
+                                    "marginRight": "20px",
+                                    "verticalAlign": "top",
+                                },
+                            ),
+                            # View dropdown container with relative positioning
+                            html.Div(
+                                [
+                                    dcc.Dropdown(
+                                        id="view-select",
+                                        options=[
+                                            {"label": "Daily", "value": "daily"},
+                                            {"label": "Monthly", "value": "monthly"},
+                                        ],
+                                        value="daily",
+                                        style={
+                                            "width": "200px",
+                                            "paddingRight": "5px",  # Add padding for the caret
+                                        },
+                                        clearable=False,
+                                    ),
+                                ],
+                                style={
+                                    "position": "relative",
+                                    "display": "inline-block",
+                                },
+                            ),
+                        ],
+                        className="dropdown-container",
+                    ),
+                    # Chart container
+                    html.Div(
+                        [
+                            # Legend
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            html.Div(
+                                                style={
+                                                    "width": "30px",
+                                                    "height": "4px",
+                                                    "backgroundColor": "#e74c3c",
+                                                    "marginRight": "8px",
+                                                }
+                                            ),
+                                            html.Div(
+                                                "Decline",
+                                                style={
+                                                    "fontSize": "0.9em",
+                                                    "color": "#555",
+                                                },
+                                            ),
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "alignItems": "center",
+                                            "marginLeft": "20px",
+                                        },
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.Div(
+                                                style={
+                                                    "width": "30px",
+                                                    "height": "4px",
+                                                    "backgroundColor": "#2ecc71",
+                                                    "marginRight": "8px",
+                                                }
+                                            ),
+                                            html.Div(
+                                                "Growth",
+                                                style={
+                                                    "fontSize": "0.9em",
+                                                    "color": "#555",
+                                                },
+                                            ),
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "alignItems": "center",
+                                            "marginLeft": "20px",
+                                        },
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.Div(
+                                                "2025 vs. 2024",
+                                                style={
+                                                    "fontSize": "0.9em",
+                                                    "color": "#555",
+                                                },
+                                            )
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "alignItems": "center",
+                                            "marginLeft": "20px",
+                                        },
+                                    ),
+                                ],
+                                style={
+                                    "display": "flex",
+                                    "alignItems": "center",
+                                    "justifyContent": "flex-end",
+                                    "marginBottom": "15px",
+                                },
+                            ),
+                            # Chart
+                            dcc.Graph(
+                                id="weekly-chart",
+                                figure=figure,
+                                config={"displayModeBar": False},
+                                style={"height": "400px"},
+                            ),
+                            # Top movers for the latest or clicked date
+                            html.Div(
+                                movers,
+                                id="top-movers",
+                                style={"marginTop": "20px"},
+                            ),
+                            # Table (hidden by default)
+                            html.Div(id="table-container", style={"display": "none"}),
+                        ],
+                        className="chart-container",
+                    ),
+                ],
+                className="container",
+            ),
+        ]
+    )
+
+
+# Update chart based on region, comparison and view selection
+@metrics.timed_callback("update_chart")
+def update_chart(selected_region, view_type, compare_regions=None):
+    snapshot = store.current
+    if compare_regions:
+        # The selected region first, then the others in the order picked
+        regions = [selected_region] + [
+            region for region in compare_regions if region != selected_region
+        ]
+        # Not cached: every ordered pick of regions would be another entry
+        # in an unbounded per-snapshot cache, and assembling the overlay from
+        # one gather takes well under a millisecond
+        return create_comparison_figure(snapshot, regions, view_type)
+    return snapshot.cached(
+        (selected_region, view_type),
+        lambda: create_figure(snapshot, selected_region, view_type),
+    )
+
+
+# Top movers for the view's latest bucket, or the one holding a clicked point
+@metrics.timed_callback("update_movers")
+def update_movers(view_type, click_data=None):
+    date = None
+    if click_data and click_data.get("points"):
+        date = click_data["points"][0].get("x")
+    # An O(k) slice of the rank index built with the snapshot
+    return render_movers(store.current.ranking.query(view_type, date, TOP_MOVERS))
+
+
+# App factory: builds the Dash app without touching the data
+def create_app(server=True, url_base_pathname=None):
+    # Initialize Dash app with custom styles
+    app = dash.Dash(
+        __name__,
+        server=server,
+        url_base_pathname=url_base_pathname,
+        meta_tags=[
+            {"name": "viewport", "content": "width=device-width, initial-scale=1"}
+        ],
+    )
+    app.index_string = INDEX_STRING
+    app.layout = serve_layout
+
+    # Callback to update chart based on region, comparison and view selection
+    app.callback(
+        Output("weekly-chart", "figure"),
+        [
+            Input("region-select", "value"),
+            Input("view-select", "value"),
+            Input("compare-select", "value"),
+        ],
+        prevent_initial_call=True,
+    )(update_chart)
+
+    # Callback to refresh the top movers on a view change or chart click
+    app.callback(
+        Output("top-movers", "children"),
+        [Input("view-select", "value"), Input("weekly-chart", "clickData")],
+        prevent_initial_call=True,
+    )(update_movers)
+
+    # Request timings and the /metrics endpoint (only with METRICS_ENABLED=1)
+    metrics.instrument(app.server)
+
+    # Per-request profiles for triage (only with PROFILE_DIR set)
+    profiling.instrument(app.server)
+
+    # Index page pre-rendered once per dataset version (DASH_SHELL=0 to disable)
+    shell.instrument(app, store)
+    return app
+
+
+# Load the data and render the default figure and page shell ahead of the
+# first request
+def preload():
+    snapshot = store.current
+    shell.warm(app)
+    return snapshot
 
-# Callback to update chart based on region and view selection
-@app.callback(
-    Output("weekly-chart", "figure"),
-    [Input("region-select", "value"), Input("view-select", "value")],
-)
-def update_chart(selected_region, view_type):
-    return create_figure(plot_df, selected_region, view_type)
 
+app = create_app()
+server = app.server
 
 if __name__ == "__main__":
+    preload()
     app.run_server(debug=True, port=8051)
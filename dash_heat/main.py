@@ -1,20 +1,23 @@
 # import dataiku
+import os
+import sys
+import math
 import dash
-from dash import dcc, html, dash_table
+from dash import dcc, html
 from dash.dependencies import Input, Output, State
-import pandas as pd
-import numpy as np
-from datetime import datetime
-import plotly.graph_objects as go
 
-# Initialize Dash app with custom styles
-app = dash.Dash(
-    __name__,
-    meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}],
-)
+# Make the shared data layer importable when running from the app folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import metrics, profiling, shell  # noqa: E402
+from common.figures import PLACEHOLDER_FIGURE, typed_array  # noqa: E402
+from common.snapshot import Snapshot, SnapshotStore, layout_snapshot  # noqa: E402
+from common.sources import make_source  # noqa: E402
+
+# pandas, numpy, plotly and the pyramid are imported inside the functions that
+# use them, so importing this module (and booting a worker) stays cheap
 
 # Custom CSS for ExampleDash-like styling
-app.index_string = """
+INDEX_STRING = """
 <!DOCTYPE html>
 <html>
     <head>
@@ -148,61 +151,58 @@ app.index_string = """
 </html>
 """
 
-# Load data from CSV with the first row as header
-df = pd.read_csv("data.csv", header=0)
+# Tiled mode: the server keeps the full matrix and the graph only receives the
+# visible region x date window, re-fetched on every pan/zoom ("on", "off" or "auto")
+TILED_MODE = os.environ.get("HEATMAP_TILED", "auto")
+TILED_MIN_CELLS = 2000  # "auto" switches to tiles above this many cells
+TILE_MAX_COLUMNS = 60  # Most buckets per tile before falling back to a coarser level
+TILE_MAX_ROWS = 25  # Rows shown in the initial window
+TILE_TEXT_MAX_CELLS = 1500  # Skip the in-cell labels on tiles larger than this
 
-# Prepare data for table and graph
-dates = df.columns[1:]  # Exclude region column
-regions = df.iloc[:, 0].tolist()  # First column as regions
 
-# Clean the data to ensure numeric values (remove % signs)
-for col in dates:
-    df[col] = df[col].str.replace("%", "").astype(float)
+# Build every derived frame and index for one version of the data file
+def build_snapshot(source, version):
+    from common.dataset import prepare
 
-# Create a copy of the original dataframe for the heatmap
-heatmap_df = df.copy()
+    # The cleaned values, their float32 daily/weekly/monthly/quarterly
+    # pyramid and the dataset over it, built once per version (shared under
+    # host/main.py). Callbacks reach the pyramid through the dataset
+    dataset = prepare(source, version).dataset
 
-# Convert to long format for plotting
-plot_df = df.copy()
-plot_df = plot_df.melt(id_vars=["Region"], var_name="Date", value_name="Change")
+    # Large grids are served as tiles
+    use_tiles = TILED_MODE == "on" or (
+        TILED_MODE == "auto" and dataset.values.size > TILED_MIN_CELLS
+    )
 
-# Add the current year to the date columns for proper parsing
-current_year = datetime.now().year
-plot_df["Date"] = plot_df["Date"] + f"/{current_year}"
+    snapshot = Snapshot(
+        version,
+        namespace="dash_heat",
+        dataset=dataset,
+        use_tiles=use_tiles,
+    )
 
-# Convert dates to datetime objects for proper sorting
-plot_df["Date"] = pd.to_datetime(plot_df["Date"], format="%m/%d/%Y")
+    # Render the initial figure off the request path
+    initial_key = ("tile" if use_tiles else "heatmap", "daily")
+    snapshot.cached(initial_key, lambda: create_initial_heatmap(snapshot))
+    return snapshot
 
-# Sort by date to ensure chronological order
-plot_df = plot_df.sort_values("Date")
 
-# Create a monthly aggregated dataframe
-monthly_df = plot_df.copy()
-monthly_df["Month"] = monthly_df["Date"].dt.strftime("%Y-%m")
-monthly_df = (
-    monthly_df.groupby(["Region", "Month"]).agg({"Change": "mean"}).reset_index()
-)
-monthly_df["Date"] = pd.to_datetime(
-    monthly_df["Month"] + "-15"
-)  # Set to middle of month for display
+# Function to create a heatmap figure
+def create_heatmap(snapshot, view_type="daily"):
+    import numpy as np
+    import plotly.graph_objects as go
 
+    regions = snapshot.dataset.regions
+    pyramid = snapshot.dataset.pyramid
 
-# Function to create a heatmap figure
-def create_heatmap(view_type="daily"):
     if view_type == "daily":
-        # Use the original data for daily view
-        z_data = heatmap_df.iloc[:, 1:].values
-        x_labels = [d for d in dates]
+        # Daily level of the pyramid, columns in date order
+        z_data = pyramid["daily"].z
+        x_labels = pyramid["daily"].labels
     else:
-        # Aggregate data by month for monthly view
-        monthly_pivot = monthly_df.pivot(
-            index="Region", columns="Month", values="Change"
-        )
-        z_data = monthly_pivot.values
-        x_labels = [
-            datetime.strptime(m, "%Y-%m").strftime("%b %Y")
-            for m in monthly_pivot.columns
-        ]
+        # Monthly level of the pyramid, rows in the same order as regions
+        z_data = np.round(pyramid["monthly"].z, 1)
+        x_labels = pyramid["monthly"].labels
 
     # Create a custom colorscale
     colorscale = [
@@ -214,21 +214,19 @@ def create_heatmap(view_type="daily"):
     # Create the heatmap figure
     fig = go.Figure(
         data=go.Heatmap(
-            z=z_data,
+            # float32 typed array; the cell labels and hover text are
+            # formatted in the browser from z instead of sent as two more
+            # strings per cell
+            z=typed_array(z_data),
             x=x_labels,
             y=regions,
             colorscale=colorscale,
             zmin=-15,  # Set minimum value for color scale
             zmax=30,  # Set maximum value for color scale
             zmid=0,  # Set the midpoint of the color scale to 0
-            text=[[f"{val}%" for val in row] for row in z_data],
-            texttemplate="%{text}",
+            texttemplate="%{z:.1f}%",
             textfont={"size": 11, "color": "black"},  # Reduced font size
-            hoverinfo="text",
-            hovertext=[
-                [f"{regions[i]}, {x_labels[j]}: {val}%" for j, val in enumerate(row)]
-                for i, row in enumerate(z_data)
-            ],
+            hovertemplate="%{y}, %{x}: %{z:.1f}%<extra></extra>",
         )
     )
 
@@ -285,114 +283,329 @@ def create_heatmap(view_type="daily"):
     return fig
 
 
-# Layout
-app.layout = html.Div(
-    [
-        # Header
-        html.Div(
-            [
-                html.Div(
-                    [
-                        html.H1(
-                            "Change in seated diners by month / day, 2025 vs. 2024"
-                        ),
-                        html.P(
-                            "This table measures the volume of seated diners from online reservations on a daily/monthly basis in 2025 vs. "
-                            "2024. For example, in Los Angeles on January 4, 2025, seated diners were up 3% compared to 2024. In the "
-                            "monthly view, data for the current month shows the YoY change in seated diners for the month-to-date. For "
-                            "example, if the date is January 10, 2025, the data compares January 1 - 10, 2025 to the same range in 2024."
-                        ),
-                    ],
-                    className="container",
-                )
+# Function to read an axis range out of the graph's relayoutData
+def parse_axis_range(relayout_data, axis):
+    if not relayout_data:
+        return None
+    if relayout_data.get(f"{axis}.autorange"):
+        return "auto"
+    if f"{axis}.range[0]" in relayout_data:
+        return [
+            float(relayout_data[f"{axis}.range[0]"]),
+            float(relayout_data[f"{axis}.range[1]"]),
+        ]
+    if f"{axis}.range" in relayout_data:
+        return [float(v) for v in relayout_data[f"{axis}.range"]]
+    return None
+
+
+# Function to create a heatmap figure holding only the visible window
+def create_heatmap_tile(snapshot, view_type="daily", x_range=None, y_range=None):
+    import numpy as np
+    import plotly.graph_objects as go
+
+    regions = snapshot.dataset.regions
+    pyramid = snapshot.dataset.pyramid
+    n_cols = len(pyramid.dates)
+    n_rows = len(regions)
+
+    # Visible window in daily column units and row units
+    x0, x1 = sorted(x_range) if x_range else (-0.5, n_cols - 0.5)
+    y0, y1 = sorted(y_range) if y_range else (-0.5, min(n_rows, TILE_MAX_ROWS) - 0.5)
+
+    # Serve the finest level that fits the column budget (monthly view starts coarser)
+    level = pyramid.pick(TILE_MAX_COLUMNS, span=x1 - x0, finest=view_type)
+
+    # Slice the buckets and rows overlapping the window, plus one on each side
+    c0 = max(0, np.searchsorted(level.x, x0, side="left") - 1)
+    c1 = min(len(level), np.searchsorted(level.x, x1, side="right") + 1)
+    r0 = max(0, math.floor(y0))
+    r1 = min(n_rows, math.ceil(y1) + 1)
+
+    z_data = np.round(level.z[r0:r1, c0:c1], 1)
+    x_values = level.x[c0:c1]
+    x_labels = level.labels[c0:c1]
+    row_labels = regions[r0:r1]
+
+    show_text = z_data.size <= TILE_TEXT_MAX_CELLS
+
+    fig = go.Figure(
+        data=go.Heatmap(
+            z=typed_array(z_data),
+            x=x_values,
+            y=np.arange(r0, r1),
+            colorscale=[
+                [0, "#e74c3c"],  # Red for negative values
+                [0.5, "#ffffff"],  # White for zero
+                [1, "#2ecc71"],  # Green for positive values
             ],
-            className="header",
-        ),
-        # Main content
-        html.Div(
-            [
-                # Dropdown container
-                html.Div(
-                    [
-                        # Country dropdown
-                        html.Div(
-                            [
-                                dcc.Dropdown(
-                                    id="country-select",
-                                    options=[{"label": "Country", "value": "country"}],
-                                    value="country",
-                                    style={
-                                        "width": "200px",
-                                        "paddingRight": "5px",
+            zmin=-15,
+            zmax=30,
+            zmid=0,
+            texttemplate="%{z:.1f}%" if show_text else None,
+            textfont={"size": 11, "color": "black"},
+            # Rows are numeric positions here, so the region and bucket names
+            # still travel as hover strings; the tile bounds their count
+            hoverinfo="text",
+            hovertext=[
+                [f"{row_labels[i]}, {x_labels[j]}: {val}%" for j, val in enumerate(row)]
+                for i, row in enumerate(z_data)
+            ],
+        )
+    )
+
+    # Fixed-size viewport: the user pans and zooms instead of scrolling a huge canvas
+    fig.update_layout(
+        paper_bgcolor="#fffdf5",
+        plot_bgcolor="#fffdf5",
+        margin={"l": 10, "r": 30, "t": 50, "b": 20},
+        dragmode="pan",
+        uirevision=view_type,  # Keep the user's zoom between tile updates
+        xaxis={
+            "side": "top",
+            "range": [x0, x1],
+            "tickvals": x_values,
+            "ticktext": x_labels,
+            "tickfont": {"size": 12, "color": "#333", "weight": "bold"},
+            "tickangle": 0,
+            "zeroline": False,
+            "showgrid": False,
+        },
+        yaxis={
+            "range": [y1, y0],  # Reversed so the first region is on top
+            "tickvals": list(range(r0, r1)),
+            "ticktext": row_labels,
+            "tickfont": {"size": 11, "color": "#333", "weight": "bold"},
+            "ticklen": 2,
+            "zeroline": False,
+            "showgrid": False,
+        },
+        height=max(350, min(n_rows, TILE_MAX_ROWS) * 30 + 80),
+        width=1200,
+    )
+
+    return fig
+
+
+# Function to create the figure shown on page load
+def create_initial_heatmap(snapshot):
+    if snapshot.use_tiles:
+        return create_heatmap_tile(snapshot, "daily")
+    return create_heatmap(snapshot, "daily")
+
+
+# Current snapshot of the data file, loaded on first use and rebuilt in the
+# background when it changes
+store = SnapshotStore(make_source("data.csv"), build_snapshot, lazy=True).start()
+
+
+# Layout, rebuilt on every page load so it follows the current snapshot
+def serve_layout():
+    # Outside a request (Dash validating the layout) there is no snapshot
+    snapshot = layout_snapshot(store)
+    if snapshot is not None:
+        use_tiles = snapshot.use_tiles
+        figure = snapshot.cached(
+            ("tile" if use_tiles else "heatmap", "daily"),
+            lambda: create_initial_heatmap(snapshot),
+        )
+    else:
+        use_tiles = False
+        figure = PLACEHOLDER_FIGURE
+    return html.Div(
+        [
+            # Header
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            html.H1(
+                                "Change in seated diners by month / day, 2025 vs. 2024"
+                            ),
+                            html.P(
+                                "This table measures the volume of seated diners from online reservations on a daily/monthly basis in 2025 vs. "
+                                "2024. For example, in Los Angeles on January 4, 2025, seated diners were up 3% compared to 2024. In the "
+                                "monthly view, data for the current month shows the YoY change in seated diners for the month-to-date. For "
+                                "example, if the date is January 10, 2025, the data compares January 1 - 10, 2025 to the same range in 2024."
+                            ),
+                        ],
+                        className="container",
+                    )
+                ],
+                className="header",
+            ),
+            # Main content
+            html.Div(
+                [
+                    # Dropdown container
+                    html.Div(
+                        [
+                            # Country dropdown
+                            html.Div(
+                                [
+                                    dcc.Dropdown(
+                                        id="country-select",
+                                        options=[
+                                            {"label": "Country", "value": "country"}
+                                        ],
+                                        value="country",
+                                        style={
+                                            "width": "200px",
+                                            "paddingRight": "5px",
+                                        },
+                                        clearable=False,
+                                    ),
+                                ],
+                                style={
+                                    "position": "relative",
+                                    "display": "inline-block",
+                                    "marginRight": "20px",
+                                },
+                            ),
+                            # View dropdown
+                            html.Div(
+                                [
+                                    dcc.Dropdown(
+                                        id="view-select",
+                                        options=[
+                                            {"label": "Daily", "value": "daily"},
+                                            {"label": "Monthly", "value": "monthly"},
+                                        ],
+                                        value="daily",
+                                        style={
+                                            "width": "200px",
+                                            "paddingRight": "5px",
+                                        },
+                                        clearable=False,
+                                    ),
+                                ],
+                                style={
+                                    "position": "relative",
+                                    "display": "inline-block",
+                                },
+                            ),
+                        ],
+                        className="dropdown-container",
+                    ),
+                    # Heatmap container
+                    html.Div(
+                        [
+                            # Heatmap
+                            html.Div(
+                                dcc.Graph(
+                                    id="heatmap-chart",
+                                    figure=figure,
+                                    config={
+                                        "displayModeBar": False,
+                                        "scrollZoom": use_tiles,
                                     },
-                                    clearable=False,
-                                ),
-                            ],
-                            style={
-                                "position": "relative",
-                                "display": "inline-block",
-                                "marginRight": "20px",
-                            },
-                        ),
-                        # View dropdown
-                        html.Div(
-                            [
-                                dcc.Dropdown(
-                                    id="view-select",
-                                    options=[
-                                        {"label": "Daily", "value": "daily"},
-                                        {"label": "Monthly", "value": "monthly"},
-                                    ],
-                                    value="daily",
                                     style={
-                                        "width": "200px",
-                                        "paddingRight": "5px",
+                                        "height": "auto",  # Changed from fixed height to auto
+                                        "minWidth": "100%",
                                     },
-                                    clearable=False,
                                 ),
-                            ],
-                            style={
-                                "position": "relative",
-                                "display": "inline-block",
-                            },
-                        ),
-                    ],
-                    className="dropdown-container",
-                ),
-                # Heatmap container
-                html.Div(
-                    [
-                        # Heatmap
-                        html.Div(
-                            dcc.Graph(
-                                id="heatmap-chart",
-                                figure=create_heatmap("daily"),
-                                config={"displayModeBar": False},
-                                style={
-                                    "height": "auto",  # Changed from fixed height to auto
-                                    "minWidth": "100%",
-                                },
+                                className="scrollable-container",
                             ),
-                            className="scrollable-container",
-                        ),
-                    ],
-                    className="chart-container",
-                ),
-            ],
-            className="container",
-        ),
-    ]
-)
+                            # Visible window of the tiled heatmap
+                            dcc.Store(id="heatmap-window", data={}),
+                        ],
+                        className="chart-container",
+                    ),
+                ],
+                className="container",
+            ),
+        ]
+    )
+
+
+# Update heatmap based on view selection and, in tiled mode, pan/zoom
+@metrics.timed_callback("update_heatmap")
+def update_heatmap(view_type, relayout_data, window):
+    triggered = [t["prop_id"] for t in dash.callback_context.triggered]
+    from_relayout = "heatmap-chart.relayoutData" in triggered
+
+    snapshot = store.current
+
+    if not snapshot.use_tiles:
+        if from_relayout:
+            return dash.no_update, dash.no_update
+        figure = snapshot.cached(
+            ("heatmap", view_type), lambda: create_heatmap(snapshot, view_type)
+        )
+        return figure, {}
+
+    # A new view resets the window; otherwise merge the axes that changed
+    window = dict(window or {}) if from_relayout else {}
+    changed = not from_relayout
+    for axis in ("xaxis", "yaxis"):
+        axis_range = parse_axis_range(relayout_data if from_relayout else None, axis)
+        if axis_range == "auto":
+            window.pop(axis, None)
+        elif axis_range is not None:
+            window[axis] = axis_range
+        changed = changed or axis_range is not None
+
+    if not changed:
+        # Relayout without an axis change (e.g. resize), nothing to fetch
+        return dash.no_update, dash.no_update
+
+    if not window:
+        # Full-extent tile, the same for every client
+        figure = snapshot.cached(
+            ("tile", view_type), lambda: create_heatmap_tile(snapshot, view_type)
+        )
+        return figure, window
+
+    figure = create_heatmap_tile(
+        snapshot, view_type, window.get("xaxis"), window.get("yaxis")
+    )
+    return figure, window
+
+
+# App factory: builds the Dash app without touching the data
+def create_app(server=True, url_base_pathname=None):
+    # Initialize Dash app with custom styles
+    app = dash.Dash(
+        __name__,
+        server=server,
+        url_base_pathname=url_base_pathname,
+        meta_tags=[
+            {"name": "viewport", "content": "width=device-width, initial-scale=1"}
+        ],
+    )
+    app.index_string = INDEX_STRING
+    app.layout = serve_layout
+
+    # Callback to update heatmap based on view selection and, in tiled mode, pan/zoom
+    app.callback(
+        [Output("heatmap-chart", "figure"), Output("heatmap-window", "data")],
+        [Input("view-select", "value"), Input("heatmap-chart", "relayoutData")],
+        [State("heatmap-window", "data")],
+        prevent_initial_call=True,
+    )(update_heatmap)
+
+    # Request timings and the /metrics endpoint (only with METRICS_ENABLED=1)
+    metrics.instrument(app.server)
+
+    # Per-request profiles for triage (only with PROFILE_DIR set)
+    profiling.instrument(app.server)
+
+    # Index page pre-rendered once per dataset version (DASH_SHELL=0 to disable)
+    shell.instrument(app, store)
+    return app
+
 
+# Load the data and render the initial heatmap and page shell ahead of the
+# first request
+def preload():
+    snapshot = store.current
+    shell.warm(app)
+    return snapshot
 
-# Callback to update heatmap based on view selection
-@app.callback(
-    Output("heatmap-chart", "figure"),
-    [Input("view-select", "value")],
-)
-def update_heatmap(view_type):
-    return create_heatmap(view_type)
 
+app = create_app()
+server = app.server
 
 if __name__ == "__main__":
+    preload()
     app.run_server(debug=True, port=8051)
@@ -1,24 +1,27 @@
 # import dataiku
+import os
+import sys
 import dash
-from dash import dcc, html, dash_table
-import plotly.express as px
-import pandas as pd
+from dash import dcc, html
 from flask import Flask
-from datetime import datetime
 
-# Flask server for Dataiku
-server = Flask(__name__)
-
-# Dash app with custom styles
-app = dash.Dash(
-    __name__,
-    server=server,
-    url_base_pathname="/",
-    meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}],
+# Make the shared data layer importable when running from the app folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import metrics, profiling, shell  # noqa: E402
+from common.figures import (  # noqa: E402
+    PLACEHOLDER_FIGURE,
+    date_array,
+    sign_marker,
+    typed_array,
 )
+from common.snapshot import Snapshot, SnapshotStore, layout_snapshot  # noqa: E402
+from common.sources import make_source  # noqa: E402
+
+# pandas is imported inside the functions that use it, so importing this
+# module (and booting a worker) stays cheap
 
 # Custom CSS for ExampleDash-like styling
-app.index_string = """
+INDEX_STRING = """
 <!DOCTYPE html>
 <html>
     <head>
@@ -112,60 +115,41 @@ app.index_string = """
 </html>
 """
 
-# Load data from CSV with the first row as header
-df = pd.read_csv("data.csv", header=0)  # Ensure the first row is treated as the header
-
-# Prepare data for table and graph
-dates = df.columns[1:]  # Exclude region column
-regions = df.iloc[:, 0].tolist()  # First column as regions
 
-# Add the current year to the date columns for proper parsing
-current_year = datetime.now().year
-df.columns = ["Region"] + [f"{d}/{current_year}" for d in dates]
+# Build every derived frame and index for one version of the data file
+def build_snapshot(source, version):
+    from common.dataset import prepare
 
-# Convert to long format for plotting
-plot_df = df.copy()
-plot_df = plot_df.melt(id_vars=["Region"], var_name="Date", value_name="Change")
+    # The cleaned values and the float32 dataset the figures read, built once
+    # per version (shared under host/main.py)
+    dataset = prepare(source, version).dataset
 
-# Clean the "Change" column to ensure it contains numeric values
-plot_df["Change"] = plot_df["Change"].str.replace("%", "", regex=False).astype(float)
+    snapshot = Snapshot(version, namespace="dash_template", dataset=dataset)
 
-# Convert dates to datetime objects for proper sorting
-plot_df["Date"] = pd.to_datetime(plot_df["Date"], format="%m/%d/%Y")
-
-# Sort by date to ensure chronological order
-plot_df = plot_df.sort_values("Date")
+    # Render the initial figure off the request path
+    snapshot.cached("Global", lambda: create_figure(dataset))
+    return snapshot
 
 
 # Function to create the figure with ExampleDash styling
-def create_figure(data):
-    # Filter to just show Global data initially
-    filtered_data = data[data["Region"] == "Global"]
+def create_figure(dataset):
+    # Show just the Global row initially
+    dates, values = dataset.series("Global")
+
+    # Dates and values go out as typed arrays (see common/figures.py)
+    y = typed_array(values)
 
     # Create a custom figure instead of using px
     figure = {
         "data": [
             {
-                "x": filtered_data["Date"],
-                "y": filtered_data["Change"],
+                "x": date_array(dates),
+                "y": y,
                 "type": "scatter",
                 "mode": "lines+markers",
                 "name": "Global",
-                "line": {
-                    "color": [
-                        "#2ecc71" if val >= 0 else "#e74c3c"
-                        for val in filtered_data["Change"]
-                    ],
-                    "width": 2,
-                    "shape": "spline",
-                },
-                "marker": {
-                    "color": [
-                        "#2ecc71" if val >= 0 else "#e74c3c"
-                        for val in filtered_data["Change"]
-                    ],
-                    "size": 8,
-                },
+                "line": {"width": 2, "shape": "spline"},
+                "marker": sign_marker(y),
                 "fill": "tozeroy",
                 "fillcolor": "rgba(46, 204, 113, 0.1)",
             }
@@ -175,6 +159,7 @@ def create_figure(data):
             "plot_bgcolor": "#fffdf5",
             "margin": {"l": 50, "r": 30, "t": 10, "b": 50},
             "xaxis": {
+                "type": "date",  # x values are epoch milliseconds
                 "showgrid": False,
                 "zeroline": False,
                 "title": "",
@@ -191,6 +176,7 @@ def create_figure(data):
                 "titlefont": {"size": 14, "color": "#555"},
                 "ticksuffix": "%",
                 "tickfont": {"size": 12, "color": "#555"},
+                "hoverformat": ".2~f",  # float32 values hover as two decimals
             },
             "hovermode": "closest",
             "hoverlabel": {
@@ -204,173 +190,184 @@ def create_figure(data):
     return figure
 
 
-# Layout
-app.layout = html.Div(
-    [
-        # Header
-        html.Div(
-            [
-                html.Div(
-                    [
-                        html.H1("Change in seated diners by week, 2025 vs. 2024"),
-                        html.P(
-                            "This graph measures the weekly change in seated diners from online reservations for 2025 vs. 2024. "
-                            "Hover over any given date to see how 2025 compares to the respective week in 2024. "
-                            "For example, in the US on the week ending on January 6, 2025, seated diners were up 25% compared to "
-                            "the respective week of the year in 2024."
-                        ),
-                    ],
-                    className="container",
-                )
-            ],
-            className="header",
-        ),
-        # Main content
-        html.Div(
-            [
-                # Region dropdown
-                html.Div(
-                    [
-                        dcc.Dropdown(
-                            id="region-select",
-                            options=[
-                                {"label": region, "value": region} for region in regions
-                            ],
-                            value="Global",
-                            style={"width": "200px", "display": "inline-block"},
-                            clearable=False,
-                        ),
-                    ],
-                    className="dropdown-container",
-                ),
-                # Chart container
-                html.Div(
-                    [
-                        # Legend
-                        html.Div(
-                            [
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            style={
-                                                "width": "30px",
-                                                "height": "4px",
-                                                "backgroundColor": "#e74c3c",
-                                                "marginRight": "8px",
-                                            }
-                                        ),
-                                        html.Div(
-                                            "Decline",
-                                            style={
-                                                "fontSize": "0.9em",
-                                                "color": "#555",
-                                            },
-                                        ),
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "alignItems": "center",
-                                        "marginLeft": "20px",
-                                    },
-                                ),
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            style={
-                                                "width": "30px",
-                                                "height": "4px",
-                                                "backgroundColor": "#2ecc71",
-                                                "marginRight": "8px",
-                                            }
-                                        ),
-                                        html.Div(
-                                            "Growth",
-                                            style={
-                                                "fontSize": "0.9em",
-                                                "color": "#555",
-                                            },
-                                        ),
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "alignItems": "center",
-                                        "marginLeft": "20px",
-                                    },
-                                ),
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            "2025 vs. 2024",
-                                            style={
-                                                "fontSize": "0.9em",
-                                                "color": "#555",
-                                            },
-                                        )
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "alignItems": "center",
-                                        "marginLeft": "20px",
-                                    },
-                                ),
-                            ],
-                            style={
-                                "display": "flex",
-                                "alignItems": "center",
-                                "justifyContent": "flex-end",
-                                "marginBottom": "15px",
-                            },
-                        ),
-                        # Chart
-                        dcc.Graph(
-                            id="weekly-graph",
-                            figure=create_figure(plot_df),
-                            config={"displayModeBar": False},
-                            style={"height": "400px"},
-                        ),
-                    ],
-                    className="chart-container",
-                ),
-            ],
-            className="container",
-        ),
-    ]
-)
+# Current snapshot of the data file, loaded on first use and rebuilt in the
+# background when it changes
+store = SnapshotStore(make_source("data.csv"), build_snapshot, lazy=True).start()
 
 
-# Add callback to update the graph based on region selection
-@app.callback(
-    dash.dependencies.Output("weekly-graph", "figure"),
-    [dash.dependencies.Input("region-select", "value")],
-)
+# Layout, rebuilt on every page load so it follows the current snapshot
+def serve_layout():
+    # Outside a request (Dash validating the layout) there is no snapshot
+    snapshot = layout_snapshot(store)
+    if snapshot is not None:
+        regions = snapshot.dataset.regions
+        figure = snapshot.cached("Global", lambda: create_figure(snapshot.dataset))
+    else:
+        regions = []
+        figure = PLACEHOLDER_FIGURE
+    return html.Div(
+        [
+            # Header
+            html.Div(
+                [
+                    html.Div(
+                        [
+                            html.H1("Change in seated diners by week, 2025 vs. 2024"),
+                            html.P(
+                                "This graph measures the weekly change in seated diners from online reservations for 2025 vs. 2024. "
+                                "Hover over any given date to see how 2025 compares to the respective week in 2024. "
+                                "For example, in the US on the week ending on January 6, 2025, seated diners were up 25% compared to "
+                                "the respective week of the year in 2024."
+                            ),
+                        ],
+                        className="container",
+                    )
+                ],
+                className="header",
+            ),
+            # Main content
+            html.Div(
+                [
+                    # Region dropdown
+                    html.Div(
+                        [
+                            dcc.Dropdown(
+                                id="region-select",
+                                options=[
+                                    {"label": region, "value": region}
+                                    for region in regions
+                                ],
+                                value="Global",
+                                style={"width": "200px", "display": "inline-block"},
+                                clearable=False,
+                            ),
+                        ],
+                        className="dropdown-container",
+                    ),
+                    # Chart container
+                    html.Div(
+                        [
+                            # Legend
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            html.Div(
+                                                style={
+                                                    "width": "30px",
+                                                    "height": "4px",
+                                                    "backgroundColor": "#e74c3c",
+                                                    "marginRight": "8px",
+                                                }
+                                            ),
+                                            html.Div(
+                                                "Decline",
+                                                style={
+                                                    "fontSize": "0.9em",
+                                                    "color": "#555",
+                                                },
+                                            ),
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "alignItems": "center",
+                                            "marginLeft": "20px",
+                                        },
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.Div(
+                                                style={
+                                                    "width": "30px",
+                                                    "height": "4px",
+                                                    "backgroundColor": "#2ecc71",
+                                                    "marginRight": "8px",
+                                                }
+                                            ),
+                                            html.Div(
+                                                "Growth",
+                                                style={
+                                                    "fontSize": "0.9em",
+                                                    "color": "#555",
+                                                },
+                                            ),
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "alignItems": "center",
+                                            "marginLeft": "20px",
+                                        },
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.Div(
+                                                "2025 vs. 2024",
+                                                style={
+                                                    "fontSize": "0.9em",
+                                                    "color": "#555",
+                                                },
+                                            )
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "alignItems": "center",
+                                            "marginLeft": "20px",
+                                        },
+                                    ),
+                                ],
+                                style={
+                                    "display": "flex",
+                                    "alignItems": "center",
+                                    "justifyContent": "flex-end",
+                                    "marginBottom": "15px",
+                                },
+                            ),
+                            # Chart
+                            dcc.Graph(
+                                id="weekly-graph",
+                                figure=figure,
+                                config={"displayModeBar": False},
+                                style={"height": "400px"},
+                            ),
+                        ],
+                        className="chart-container",
+                    ),
+                ],
+                className="container",
+            ),
+        ]
+    )
+
+
+# Update the graph based on region selection
+@metrics.timed_callback("update_graph")
 def update_graph(selected_region):
-    # Filter data for the selected region
-    filtered_data = plot_df[plot_df["Region"] == selected_region]
+    snapshot = store.current
+    return snapshot.cached(
+        selected_region,
+        lambda: build_region_figure(snapshot.dataset, selected_region),
+    )
+
+
+# Function to create the figure for one region
+def build_region_figure(dataset, selected_region):
+    # One row of the daily matrix for the selected region
+    dates, values = dataset.series(selected_region)
+
+    # Dates and values go out as typed arrays (see common/figures.py)
+    y = typed_array(values)
 
     # Create a custom figure with the filtered data
     figure = {
         "data": [
             {
-                "x": filtered_data["Date"],
-                "y": filtered_data["Change"],
+                "x": date_array(dates),
+                "y": y,
                 "type": "scatter",
                 "mode": "lines+markers",
                 "name": selected_region,
-                "line": {
-                    "color": [
-                        "#2ecc71" if val >= 0 else "#e74c3c"
-                        for val in filtered_data["Change"]
-                    ],
-                    "width": 2,
-                    "shape": "spline",
-                },
-                "marker": {
-                    "color": [
-                        "#2ecc71" if val >= 0 else "#e74c3c"
-                        for val in filtered_data["Change"]
-                    ],
-                    "size": 8,
-                },
+                "line": {"width": 2, "shape": "spline"},
+                "marker": sign_marker(y),
                 "fill": "tozeroy",
                 "fillcolor": "rgba(46, 204, 113, 0.1)",
             }
@@ -380,6 +377,7 @@ def update_graph(selected_region):
             "plot_bgcolor": "#fffdf5",
             "margin": {"l": 50, "r": 30, "t": 10, "b": 50},
             "xaxis": {
+                "type": "date",  # x values are epoch milliseconds
                 "showgrid": False,
                 "zeroline": False,
                 "title": "",
@@ -396,6 +394,7 @@ def update_graph(selected_region):
                 "titlefont": {"size": 14, "color": "#555"},
                 "ticksuffix": "%",
                 "tickfont": {"size": 12, "color": "#555"},
+                "hoverformat": ".2~f",  # float32 values hover as two decimals
             },
             "hovermode": "closest",
             "hoverlabel": {
@@ -409,6 +408,54 @@ def update_graph(selected_region):
     return figure
 
 
+# App factory: builds the Flask server and Dash app without touching the data
+def create_app(server=None, url_base_pathname="/"):
+    # Flask server for Dataiku
+    if server is None:
+        server = Flask(__name__)
+
+    # Request timings and the /metrics endpoint (only with METRICS_ENABLED=1)
+    metrics.instrument(server)
+
+    # Per-request profiles for triage (only with PROFILE_DIR set)
+    profiling.instrument(server)
+
+    # Dash app with custom styles
+    app = dash.Dash(
+        __name__,
+        server=server,
+        url_base_pathname=url_base_pathname,
+        meta_tags=[
+            {"name": "viewport", "content": "width=device-width, initial-scale=1"}
+        ],
+    )
+    app.index_string = INDEX_STRING
+    app.layout = serve_layout
+
+    # Add callback to update the graph based on region selection
+    app.callback(
+        dash.dependencies.Output("weekly-graph", "figure"),
+        [dash.dependencies.Input("region-select", "value")],
+        prevent_initial_call=True,
+    )(update_graph)
+
+    # Index page pre-rendered once per dataset version (DASH_SHELL=0 to disable)
+    shell.instrument(app, store)
+    return app
+
+
+# Load the data and render the Global figure and page shell ahead of the
+# first request
+def preload():
+    snapshot = store.current
+    shell.warm(app)
+    return snapshot
+
+
+app = create_app()
+server = app.server
+
 # Run the app
 if __name__ == "__main__":
+    preload()
     app.run_server(debug=True)
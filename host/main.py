@@ -0,0 +1,119 @@
+# Combined host: every dashboard in one process on one shared dataset
+#
+#   python host/main.py                       # dev server on :8050
+#   python serve.py host --workers 4          # gunicorn, preloaded
+#
+# The data file is read, cleaned and aggregated once per version and each
+# dashboard builds its own derived parts from that, so five dashboards cost
+# one parse, one pyramid, one DatasetSnapshot and one reload watcher.
+import os
+import sys
+
+from flask import Flask, render_template_string
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+# Make the shared data layer importable when running from the app folder
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from common import metrics, profiling, serving, shell  # noqa: E402
+from common.dataset import Prepared, PreparedSource  # noqa: E402
+from common.snapshot import Snapshot, SnapshotStore, StoreView, use_store  # noqa: E402
+from common.sources import load_frame, make_source  # noqa: E402
+
+# Dash apps mount on the host server under their own url_base_pathname
+DASH_MOUNTS = {
+    "dash": "/dash/",
+    "dash_heat": "/heat/",
+    "dash_template": "/template/",
+}
+
+# Flask apps keep their own routes (/, /data) under a path prefix
+FLASK_MOUNTS = {
+    "standardwebapp_enhanced": "/enhanced",
+    "standardwebapp_template": "/basic",
+}
+
+INDEX_TEMPLATE = """<!DOCTYPE html>
+<html>
+  <head><title>State of the Restaurant Industry</title></head>
+  <body style="font-family: Helvetica, Arial, sans-serif; padding: 20px">
+    <h1>Dashboards</h1>
+    <ul>
+      {% for name, path in mounts %}<li><a href="{{ path }}">{{ name }}</a></li>
+      {% endfor %}
+    </ul>
+  </body>
+</html>
+"""
+
+# One source for every dashboard (Dataiku dataset when DATAIKU_DATASET is set).
+# The default is the repository's sample file, so the host runs from any folder
+data_source = make_source(
+    os.environ.get("HOST_DATA_FILE", os.path.join(ROOT, "dash", "data.csv"))
+)
+
+modules = {name: serving.load_app(name) for name in {**DASH_MOUNTS, **FLASK_MOUNTS}}
+
+
+# Read and prepare the source once, then let every dashboard build its part
+# from that: the apps find the prepared data on the source and reuse it
+def build_snapshot(source, version):
+    prepared = Prepared(load_frame(source), version, name=source.name)
+    shared = PreparedSource(prepared, name=source.name)
+    parts = {
+        name: module.build_snapshot(shared, version) for name, module in modules.items()
+    }
+    return Snapshot(version, prepared=prepared, **parts)
+
+
+# Combined snapshot, loaded on first use and rebuilt in the background when
+# the source changes; each dashboard reads its own part through a view
+store = SnapshotStore(data_source, build_snapshot, lazy=True).start()
+for name, module in modules.items():
+    use_store(module, StoreView(store, name))
+
+
+def create_app():
+    server = Flask(__name__)
+
+    # Request timings and the /metrics endpoint (only with METRICS_ENABLED=1)
+    metrics.instrument(server)
+
+    # Per-request profiles for triage (only with PROFILE_DIR set)
+    profiling.instrument(server)
+
+    dash_apps = {
+        name: modules[name].create_app(server=server, url_base_pathname=path)
+        for name, path in DASH_MOUNTS.items()
+    }
+
+    @server.route("/")
+    def index():
+        mounts = list(DASH_MOUNTS.items()) + [
+            (name, path + "/") for name, path in FLASK_MOUNTS.items()
+        ]
+        return render_template_string(INDEX_TEMPLATE, mounts=mounts)
+
+    server.wsgi_app = DispatcherMiddleware(
+        server.wsgi_app,
+        {path: modules[name].app for name, path in FLASK_MOUNTS.items()},
+    )
+    return server, dash_apps
+
+
+server, dash_apps = create_app()
+
+
+# Load the shared snapshot and warm every dashboard's first response
+def preload():
+    snapshot = store.current
+    for app in dash_apps.values():
+        shell.warm(app)
+    for name in FLASK_MOUNTS:
+        modules[name].preload()
+    return snapshot
+
+
+if __name__ == "__main__":
+    preload()
+    server.run(debug=True, port=8050, use_reloader=False)
@@ -0,0 +1,61 @@
+# Production entry point for the dashboards
+#
+#   python serve.py dash_heat --workers 4 --threads 8 --port 8051
+#   python serve.py standardwebapp_enhanced --server waitress
+#   python serve.py dash --server dev   # Werkzeug, for comparison only
+#
+# The app is imported and its data preloaded once, then gunicorn forks the
+# workers from that warm process (preload_app). Run it from the same folder
+# the app's own `python main.py` would run from, so relative data paths match.
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import aggregate, serving  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a dashboard")
+    parser.add_argument("app", choices=serving.APPS)
+    parser.add_argument(
+        "--server", default="gunicorn", choices=["gunicorn", "waitress", "dev"]
+    )
+    parser.add_argument("--host", default=os.environ.get("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8050)))
+    parser.add_argument("--workers", type=int, default=serving.DEFAULT_WORKERS)
+    parser.add_argument("--threads", type=int, default=serving.DEFAULT_THREADS)
+    parser.add_argument(
+        "--keepalive",
+        type=int,
+        default=serving.DEFAULT_KEEPALIVE,
+        help="Seconds to hold idle keep-alive connections",
+    )
+    parser.add_argument("--timeout", type=int, default=serving.DEFAULT_TIMEOUT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # Pyramid workers re-run this script's top level, which only imports
+    aggregate.enable_workers()
+    module = serving.load_app(args.app)
+    serving.preload(module)
+
+    if args.server == "dev":
+        serving.serve_dev(module, args.host, args.port)
+    elif args.server == "waitress":
+        serving.serve_waitress(module, args.host, args.port, threads=args.threads)
+    else:
+        serving.serve_gunicorn(
+            module,
+            args.host,
+            args.port,
+            workers=args.workers,
+            threads=args.threads,
+            keepalive=args.keepalive,
+            timeout=args.timeout,
+        )
+
+
+if __name__ == "__main__":
+    main()
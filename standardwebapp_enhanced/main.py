@@ -1,61 +1,55 @@
 # import dataiku
-from flask import Flask, render_template, jsonify
-import pandas as pd
-from datetime import datetime, timedelta
+import os
+import sys
+from flask import Flask, abort, jsonify, render_template, request
+import numpy as np
+
+# Make the shared data layer importable when running from the app folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import metrics, persist, profiling  # noqa: E402
+from common.dataset import prepare  # noqa: E402
+from common.derived import SUMMARY_FIELDS, Derived  # noqa: E402
+from common.ranking import Ranking  # noqa: E402
+from common.snapshot import Snapshot, SnapshotStore  # noqa: E402
+from common.sources import make_source  # noqa: E402
 
 app = Flask(__name__)
 
+# Request timings and the /metrics endpoint (only with METRICS_ENABLED=1)
+metrics.instrument(app)
+
+# Per-request profiles for triage (only with PROFILE_DIR set)
+profiling.instrument(app)
+
+# Read in chunks from Dataiku ("seated_diners_2025_vs_2024") or the local CSV
+data_source = make_source("data.csv")
+
+
+# Function to round a region x bucket matrix for JSON, widened to float64
+# first so the float32 levels encode as the short decimals they stand for
+def rounded(z, decimals=1):
+    return np.round(np.asarray(z, dtype=float), decimals)
+
 
-def aggregate_weekly(df):
-    date_cols = [col for col in df.columns if col != "Region"]
-    weekly_data = {}
-    for region in df["Region"]:
-        weekly_data[region] = []
-        region_row = df[df["Region"] == region].iloc[0]
-        week_start = datetime(2025, 1, 1)
-        week_values = []
-        for date in date_cols:
-            current_date = datetime.strptime(f"2025-{date}", "%Y-%m/%d")
-            if current_date < week_start + timedelta(days=7):
-                # Clean the percentage value
-                value = region_row[date]
-                if isinstance(value, str):
-                    value = value.replace("%", "")
-                week_values.append(float(value))
-            else:
-                weekly_data[region].append(
-                    round(sum(week_values) / len(week_values), 1)
-                )
-                # Clean the percentage value
-                value = region_row[date]
-                if isinstance(value, str):
-                    value = value.replace("%", "")
-                week_values = [float(value)]
-                week_start += timedelta(days=7)
-        if week_values:
-            weekly_data[region].append(round(sum(week_values) / len(week_values), 1))
-    return weekly_data
-
-
-def aggregate_monthly(df):
-    date_cols = [col for col in df.columns if col != "Region"]
-    monthly_data = {"January": {}, "February": {}, "March": {}}
-    for region in df["Region"]:
-        region_row = df[df["Region"] == region].iloc[0]
-        for month in monthly_data:
-            month_num = {"January": 1, "February": 2, "March": 3}[month]
-            month_values = []
-            for date in date_cols:
-                if datetime.strptime(f"2025-{date}", "%Y-%m/%d").month == month_num:
-                    # Clean the percentage value
-                    value = region_row[date]
-                    if isinstance(value, str):
-                        value = value.replace("%", "")
-                    month_values.append(float(value))
-            monthly_data[month][region] = (
-                round(sum(month_values) / len(month_values), 1) if month_values else 0
-            )
-    return monthly_data
+def aggregate_weekly(dataset):
+    weekly = rounded(dataset.pyramid["weekly"].z)
+    return {region: weekly[i].tolist() for i, region in enumerate(dataset.regions)}
+
+
+# Month names, with the year once the data spans more than one
+def month_labels(periods):
+    if len(set(periods.year)) > 1:
+        return list(periods.strftime("%B %Y"))
+    return list(periods.strftime("%B"))
+
+
+def aggregate_monthly(dataset):
+    level = dataset.pyramid["monthly"]
+    monthly = np.nan_to_num(rounded(level.z), nan=0.0)
+    return {
+        month: {region: monthly[i, j] for i, region in enumerate(dataset.regions)}
+        for j, month in enumerate(month_labels(level.periods))
+    }
 
 
 @app.route("/")
@@ -63,33 +57,252 @@ def index():
     return render_template("index.html")
 
 
-@app.route("/data")
-def get_data():
-    # dataset = dataiku.Dataset("seated_diners_2025_vs_2024")
-    # df = dataset.get_dataframe()
-    df = pd.read_csv("data.csv")
+# Load the dataset and the derived metrics for one version of the data
+def build_snapshot(source, version):
+    # Cleaned and aggregated once per version (shared under host/main.py);
+    # the routes read the regions and levels from the dataset
+    data = prepare(source, version)
+    pyramid = data.pyramid
+    with metrics.stage("derived"):
+        derived = Derived(pyramid)
+        # Regions sorted per day and per month, for /rank
+        ranking = Ranking(pyramid, data.regions)
+    # Column labels of the /table views, formatted once per version
+    table_labels = {
+        "daily": pyramid["daily"].labels,
+        "monthly": month_labels(pyramid["monthly"].periods),
+    }
+    return Snapshot(
+        version,
+        namespace="standardwebapp_enhanced",
+        dataset=data.dataset,
+        # The raw "5%" frame, for the legacy schema's daily records only
+        frame=data.frame,
+        derived=derived,
+        ranking=ranking,
+        table_labels=table_labels,
+    )
+
+
+# Current snapshot of the data, loaded on first use and rebuilt in the
+# background when it changes
+store = SnapshotStore(data_source, build_snapshot, lazy=True).start()
+
+
+# Function to turn a region x bucket matrix into JSON-ready rows: one
+# decimal (float32 holds it exactly enough) and null for missing cells
+def matrix_rows(z, decimals=1):
+    return np.where(np.isnan(z), None, rounded(z, decimals)).tolist()
+
+
+# Function to lay out one view's derived stats as columns
+def stats_columns(level):
+    counts = ["positive", "negative", "zero"]
+    values = np.column_stack(
+        [level.summary] + [getattr(level, name) for name in counts]
+    )
+    return {"fields": SUMMARY_FIELDS + counts, "values": matrix_rows(values)}
+
+
+# Encode the /data response for one snapshot: numbers only, columnar. Every
+# view is a region x bucket matrix in the order of the top-level "regions",
+# with its column labels (ISO dates for the daily view) sent once
+def build_payload(snapshot):
+    pyramid = snapshot.dataset.pyramid
+    derived = snapshot.derived
+    weekly = pyramid["weekly"]
+    monthly = pyramid["monthly"]
 
-    # Daily data
+    payload = {
+        "schema": 2,
+        "regions": list(snapshot.dataset.regions),
+        "daily": {
+            "dates": list(pyramid.dates.strftime("%Y-%m-%d")),
+            "values": matrix_rows(pyramid["daily"].z),
+            "stats": stats_columns(derived["daily"]),
+        },
+        "weekly": {
+            "labels": [f"Week {i+1}" for i in range(len(weekly))],
+            "values": matrix_rows(weekly.z),
+            "rolling": {
+                "window": derived["weekly"].window,
+                "values": matrix_rows(derived["weekly"].rolling),
+            },
+            "stats": stats_columns(derived["weekly"]),
+        },
+        "monthly": {
+            "labels": month_labels(monthly.periods),
+            "values": matrix_rows(monthly.z),
+            "stats": stats_columns(derived["monthly"]),
+        },
+    }
+    with metrics.stage("encode"):
+        return app.json.dumps(payload)
+
+
+# Encode the previous /data schema ("5%" strings per daily cell, one dict
+# per region), kept for clients that ask for /data?schema=legacy
+def build_legacy_payload(snapshot):
+    frame = snapshot.frame
+    dataset = snapshot.dataset
+
+    # Daily data, as the file has it
     daily_data = {
-        "dates": df.columns[1:].tolist(),
-        "regions": df.to_dict(orient="records"),
+        "dates": frame.columns[1:].tolist(),
+        "regions": frame.to_dict(orient="records"),
     }
 
-    # Weekly data
-    weekly_data = aggregate_weekly(df)
-    week_labels = [f"Week {i+1}" for i in range(len(weekly_data["Global"]))]
+    # Weekly and monthly data, both read from one pre-aggregated pyramid
+    weekly_data = aggregate_weekly(dataset)
+    week_labels = [f"Week {i+1}" for i in range(len(dataset.pyramid["weekly"]))]
 
     # Monthly data
-    monthly_data = aggregate_monthly(df)
+    monthly_data = aggregate_monthly(dataset)
     month_labels = list(monthly_data.keys())
 
-    return jsonify(
-        {
-            "daily": daily_data,
-            "weekly": {"labels": week_labels, "data": weekly_data},
-            "monthly": {"labels": month_labels, "data": monthly_data},
-        }
+    # Precomputed per-region ranges and the weekly rolling mean
+    derived = snapshot.derived
+    regions = dataset.regions
+    stats = {
+        view: derived[view].table(regions) for view in ("daily", "weekly", "monthly")
+    }
+    weekly_rolling = np.round(derived["weekly"].rolling, 1)
+
+    with metrics.stage("encode"):
+        payload = app.json.dumps(
+            {
+                "daily": dict(daily_data, stats=stats["daily"]),
+                "weekly": {
+                    "labels": week_labels,
+                    "data": weekly_data,
+                    "rolling": {
+                        "window": derived["weekly"].window,
+                        "data": {
+                            region: weekly_rolling[i].tolist()
+                            for i, region in enumerate(regions)
+                        },
+                    },
+                    "stats": stats["weekly"],
+                },
+                "monthly": {
+                    "labels": month_labels,
+                    "data": monthly_data,
+                    "stats": stats["monthly"],
+                },
+            }
+        )
+    return payload
+
+
+@app.route("/data")
+def get_data():
+    # Built once per data version; a burst of requests after a reload shares
+    # one build instead of each aggregating the same frame
+    snapshot = store.current
+    if request.args.get("schema") == "legacy":
+        schema = "legacy"
+        body = snapshot.cached(
+            ("data", "legacy"), lambda: build_legacy_payload(snapshot)
+        )
+    else:
+        schema = "columnar"
+        body = snapshot.cached("data", lambda: build_payload(snapshot))
+    response = app.response_class(body, mimetype="application/json")
+    # The dataset fingerprint, code release and schema are the ETag, so a
+    # client revalidates to a 304 until the data or the encoding changes
+    response.set_etag(persist.etag(snapshot.version, schema))
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+# Top movers for a day or month: /rank?date=2025-01-05&k=5&level=daily
+@app.route("/rank")
+def get_rank():
+    snapshot = store.current
+    level = request.args.get("level", "daily")
+    if level not in snapshot.ranking.levels:
+        abort(400, description=f"Unknown level: {level}")
+    k = request.args.get("k", 5, type=int)
+    date = request.args.get("date")
+    # A slice of the index built at load time, no sort per request
+    result = snapshot.ranking.query(level, date, k)
+    if result is None:
+        abort(404, description=f"No {level} data for {date}")
+    response = jsonify(result)
+    response.set_etag(persist.etag(snapshot.version))
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+# Largest table window one /table request may ask for
+MAX_TABLE_ROWS = 200
+MAX_TABLE_COLS = 100
+
+
+# Function to cut one window out of the cached daily or monthly matrix
+def table_window(snapshot, view, row, rows, col, cols):
+    level = snapshot.dataset.pyramid[view]
+    n_rows, n_cols = level.z.shape
+    row = min(max(row, 0), n_rows)
+    col = min(max(col, 0), n_cols)
+    row_end = min(row + min(max(rows, 0), MAX_TABLE_ROWS), n_rows)
+    col_end = min(col + min(max(cols, 0), MAX_TABLE_COLS), n_cols)
+
+    # Only the window is rounded (one decimal for both views, as in /data);
+    # missing cells go out as null rather than NaN, which is not JSON
+    values = rounded(level.z[row:row_end, col:col_end])
+    block = values.astype(object)
+    block[np.isnan(values)] = None
+
+    # MIN/AVG/MAX columns for the same rows, from the derived metrics
+    summary = np.round(snapshot.derived[view].summary[row:row_end], 1)
+    fields = [SUMMARY_FIELDS.index(name) for name in ("min", "mean", "max")]
+    stats = summary[:, fields].astype(object)
+    stats[np.isnan(summary[:, fields])] = None
+
+    return {
+        "view": view,
+        "total_rows": n_rows,
+        "total_cols": n_cols,
+        "row": row,
+        "col": col,
+        "regions": list(snapshot.dataset.regions[row:row_end]),
+        "columns": snapshot.table_labels[view][col:col_end],
+        "values": block.tolist(),
+        "stats": stats.tolist(),
+    }
+
+
+# One window of the daily or monthly table:
+# /table?view=daily&row=0&rows=50&col=0&cols=30
+@app.route("/table")
+def get_table():
+    snapshot = store.current
+    view = request.args.get("view", "daily")
+    if view not in ("daily", "monthly"):
+        abort(400, description=f"Unknown view: {view}")
+    args = request.args
+    result = table_window(
+        snapshot,
+        view,
+        args.get("row", 0, type=int),
+        args.get("rows", 50, type=int),
+        args.get("col", 0, type=int),
+        args.get("cols", 30, type=int),
     )
+    response = jsonify(result)
+    # Windows of one data version never change, so the browser revalidates
+    # each against the dataset fingerprint and code release
+    response.set_etag(persist.etag(snapshot.version))
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+# Load the data and encode the /data payload ahead of the first request
+def preload():
+    snapshot = store.current
+    snapshot.cached("data", lambda: build_payload(snapshot))
+    return snapshot
 
 
 if __name__ == "__main__":
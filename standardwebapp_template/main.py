@@ -1,8 +1,9 @@
 # import dataiku
-from flask import Flask, render_template, jsonify, abort
-import pandas as pd
+from flask import Flask, render_template, jsonify, abort, request
 import os
+import sys
 import logging
+import pandas as pd
 
 # Configure logging
 logging.basicConfig(
@@ -16,6 +17,24 @@ app = Flask(__name__)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_FILE = os.path.join(BASE_DIR, "data.csv")
 
+# Make the shared data layer importable when running from the app folder
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+from common import metrics, persist, profiling  # noqa: E402
+from common.dataset import prepare  # noqa: E402
+from common.derived import ROLLING_WINDOWS, LevelMetrics  # noqa: E402
+from common.ranking import Ranking, movers  # noqa: E402
+from common.snapshot import Snapshot, SnapshotStore  # noqa: E402
+from common.sources import LocalSource, make_source  # noqa: E402
+
+# Dataiku dataset when DATAIKU_DATASET is set, the local file otherwise
+data_source = make_source(DATA_FILE)
+
+# Request timings and the /metrics endpoint (only with METRICS_ENABLED=1)
+metrics.instrument(app)
+
+# Per-request profiles for triage (only with PROFILE_DIR set)
+profiling.instrument(app)
+
 
 # Route for the main page
 @app.route("/")
@@ -23,52 +42,107 @@ def index():
     return render_template("index.html")
 
 
+# Load and clean one version of the data
+def build_snapshot(source, version):
+    # Read the data in chunks from the configured source, cleaned once per
+    # version (shared under host/main.py)
+    data = prepare(source, version)
+    frame = data.frame
+
+    # Validate data structure
+    if "Region" not in frame.columns and len(frame.columns) < 2:
+        logger.error("Invalid data format: missing Region column or insufficient data")
+        raise ValueError("Invalid data format")
+
+    # The table's frame: regions, then the cleaned percentages as floats
+    df = pd.DataFrame(data.values, columns=frame.columns[1:])
+    df.insert(0, frame.columns[0], data.regions)
+
+    with metrics.stage("derived"):
+        # Per-region ranges for the table, over the daily columns as listed
+        values = data.values
+        derived = LevelMetrics("daily", values, ROLLING_WINDOWS["daily"])
+        # Regions sorted per day in date order, for /rank: the latest day by
+        # default, and a header label or an ISO date otherwise
+        ranking = Ranking(data.pyramid, data.regions, levels=("daily",))["daily"]
+    return Snapshot(
+        version,
+        namespace="standardwebapp_template",
+        df=df,
+        derived=derived,
+        ranking=ranking,
+        regions=data.regions,
+    )
+
+
+# Current snapshot of the data, loaded on first use and rebuilt in the
+# background when it changes
+store = SnapshotStore(data_source, build_snapshot, lazy=True).start()
+
+
+# Encode the /data response for one snapshot
+def build_payload(snapshot):
+    df = snapshot.df
+    # Convert dataframe to a dictionary for JSON response
+    data = {
+        "dates": df.columns[1:].tolist(),  # Assuming first column is region
+        "regions": df.to_dict(orient="records"),
+        # Min/max/mean/percentiles and sign counts per region, precomputed
+        "stats": snapshot.derived.table(df.iloc[:, 0].tolist()),
+    }
+    with metrics.stage("encode"):
+        return app.json.dumps(data)
+
+
 # Route to fetch data as JSON
 @app.route("/data")
 def get_data():
     try:
         # Check if file exists
-        if not os.path.exists(DATA_FILE):
-            logger.error(f"Data file not found: {DATA_FILE}")
+        source = store.source
+        if isinstance(source, LocalSource) and not source.exists():
+            logger.error(f"Data file not found: {source.path}")
             abort(500, description="Data file not found")
 
-        # Read the CSV file
-        df = pd.read_csv(DATA_FILE)
-
-        # Validate data structure
-        if "Region" not in df.columns and len(df.columns) < 2:
-            logger.error(
-                "Invalid data format: missing Region column or insufficient data"
-            )
-            abort(500, description="Invalid data format")
-
-        # Clean percentage values in the dataframe
-        for col in df.columns[1:]:  # Skip the Region column
-            # Clean the percentage values to ensure they contain numeric values
-            df[col] = (
-                df[col]
-                .apply(
-                    lambda x: (
-                        str(x).replace("%", "")
-                        if isinstance(x, (str, int, float))
-                        else x
-                    )
-                )
-                .astype(float)
-            )
-
-        # Convert dataframe to a dictionary for JSON response
-        data = {
-            "dates": df.columns[1:].tolist(),  # Assuming first column is region
-            "regions": df.to_dict(orient="records"),
-        }
-        return jsonify(data)
+        # Encoded once per data version
+        snapshot = store.current
+        body = snapshot.cached("data", lambda: build_payload(snapshot))
+        response = app.response_class(body, mimetype="application/json")
+        # The dataset fingerprint and code release are the ETag, so a client
+        # revalidates to a 304 until the data or the encoding changes
+        response.set_etag(persist.etag(snapshot.version))
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
 
     except Exception as e:
         logger.exception(f"Error processing data: {str(e)}")
         abort(500, description=f"Server error: {str(e)}")
 
 
+# Top movers for one date column: /rank?date=3/9&k=5 (the last column of
+# the file when no date is given)
+@app.route("/rank")
+def get_rank():
+    snapshot = store.current
+    date = request.args.get("date")
+    result = movers(
+        snapshot.ranking, snapshot.regions, date, request.args.get("k", 5, type=int)
+    )
+    if result is None:
+        abort(404, description=f"No data for {date}")
+    response = jsonify(result)
+    response.set_etag(persist.etag(snapshot.version))
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+# Load the data and encode the /data payload ahead of the first request
+def preload():
+    snapshot = store.current
+    snapshot.cached("data", lambda: build_payload(snapshot))
+    return snapshot
+
+
 # Error handler for 500 errors
 @app.errorhandler(500)
 def server_error(e):
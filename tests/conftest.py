@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The apps import the shared layer as `common`, from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
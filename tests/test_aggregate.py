@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common import aggregate
+from common.pyramid import Pyramid
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(40, 400))
+    values[rng.random(values.shape) < 0.05] = np.nan
+    return values
+
+
+@pytest.fixture
+def dates():
+    return pd.date_range("2024-01-01", periods=400)
+
+
+@pytest.fixture(autouse=True)
+def shard_everything(monkeypatch):
+    # Shard however small the matrix, and leave no pool behind
+    monkeypatch.setattr(aggregate, "PARALLEL_MIN_CELLS", 0)
+    yield
+    aggregate.shutdown()
+
+
+def test_sharded_build_matches_in_process(values, dates):
+    expected = Pyramid(values, dates, workers=1).buffer
+    result = Pyramid(values, dates, workers=3).buffer
+    assert np.array_equal(expected, result, equal_nan=True)
+
+
+def test_sharded_float32_build_matches_in_process(values, dates):
+    expected = Pyramid(values, dates, workers=1, dtype=np.float32).buffer
+    result = Pyramid(values, dates, workers=3, dtype=np.float32).buffer
+    assert result.dtype == np.float32
+    assert np.array_equal(expected, result, equal_nan=True)
+
+
+def test_rebuild_after_fork(values, dates):
+    # A gunicorn worker forked from a master that already built with a pool
+    # (serve.py preloads) must still be able to rebuild on reload
+    expected = Pyramid(values, dates, workers=1).buffer
+    Pyramid(values, dates, workers=2)
+
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            result = Pyramid(values, dates, workers=2).buffer
+            code = 0 if np.array_equal(expected, result, equal_nan=True) else 2
+            aggregate.shutdown()
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+    # The parent's pool is untouched
+    result = Pyramid(values, dates, workers=2).buffer
+    assert np.array_equal(expected, result, equal_nan=True)
+
+
+def test_default_workers_need_an_opt_in(values, dates, monkeypatch):
+    # An app's own `python main.py` must not spawn workers that re-run it
+    monkeypatch.setattr(aggregate, "WORKERS", 2)
+    monkeypatch.setattr(aggregate, "_workers_enabled", False)
+    Pyramid(values, dates)
+    assert aggregate._pool is None
+
+    aggregate.enable_workers()
+    Pyramid(values, dates)
+    assert aggregate._pool is not None
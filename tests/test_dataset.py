@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.dataset import DatasetSnapshot, Prepared
+from common.pyramid import Pyramid
+
+
+@pytest.fixture
+def frame():
+    dates = [f"{month}/{day}" for month in (1, 2, 3) for day in range(1, 11)]
+    rows = [
+        [region] + [f"{(i * 7 + j) % 13 - 4}%" for j in range(len(dates))]
+        for i, region in enumerate(["Global", "Australia", "Canada"])
+    ]
+    return pd.DataFrame(rows, columns=["Region"] + dates)
+
+
+def test_dataset_is_a_view_of_the_float32_pyramid(frame):
+    prepared = Prepared(frame, "v1")
+    dataset = prepared.dataset
+    buffer = prepared.pyramid.buffer
+    assert buffer.dtype == np.float32
+    assert np.shares_memory(dataset.values, buffer)
+    assert np.shares_memory(dataset.monthly, buffer)
+    assert not dataset.values.flags.writeable
+
+    # Every level is counted once, and the views not at all
+    parts = dataset.footprint()
+    assert parts["levels"] == buffer.nbytes
+    assert "values" not in parts and "monthly" not in parts
+    assert parts["total"] == sum(v for k, v in parts.items() if k != "total")
+
+    # The cleaned matrix and the raw frame come on top
+    total = prepared.footprint()
+    assert total["clean"] == prepared.values.nbytes
+    assert total["total"] == parts["total"] + total["clean"] + total["frame"]
+
+
+def test_copies_of_a_float64_pyramid_are_counted(frame):
+    prepared = Prepared(frame, "v1")
+    pyramid = Pyramid(prepared.values, prepared.dates)
+    dataset = DatasetSnapshot("v1", pyramid, prepared.regions)
+    parts = dataset.footprint()
+    assert parts["levels"] == pyramid.buffer.nbytes
+    assert parts["values"] == dataset.values.nbytes
+    assert parts["monthly"] == dataset.monthly.nbytes
@@ -0,0 +1,43 @@
+import calendar
+
+import pytest
+
+from common import dates
+from common.dates import parse_headers
+
+
+def test_month_day_headers_wrap_into_the_next_year():
+    parsed = parse_headers(["12/30", "12/31", "1/1", "1/2"], year=2025)
+    assert list(parsed.strftime("%Y-%m-%d")) == [
+        "2024-12-30",
+        "2024-12-31",
+        "2025-01-01",
+        "2025-01-02",
+    ]
+
+
+def test_descending_headers():
+    parsed = parse_headers(["1/3", "1/2", "1/1", "12/31"], year=2025)
+    assert list(parsed.year) == [2025, 2025, 2025, 2024]
+
+
+def test_leap_day_lands_in_a_leap_year(monkeypatch):
+    monkeypatch.setattr(dates, "DATA_YEAR", None)
+    parsed = parse_headers(["2/28", "2/29", "3/1"])
+    assert calendar.isleap(parsed[1].year)
+    assert (parsed[1].month, parsed[1].day) == (2, 29)
+    assert list(parsed.year) == [parsed[1].year] * 3
+
+
+def test_leap_day_across_years(monkeypatch):
+    monkeypatch.setattr(dates, "DATA_YEAR", None)
+    # 2/29 in the first year of a file that runs into the next one
+    parsed = parse_headers(["2/28", "2/29", "3/1", "12/31", "1/1"])
+    assert calendar.isleap(parsed[1].year)
+    assert parsed[-1].year == parsed[1].year + 1
+
+
+def test_leap_day_with_an_explicit_year_is_rejected():
+    with pytest.raises(ValueError, match="DATA_YEAR"):
+        parse_headers(["2/28", "2/29", "3/1"], year=2025)
+    assert parse_headers(["2/28", "2/29", "3/1"], year=2024)[1].day == 29
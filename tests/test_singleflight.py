@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+from common.snapshot import Snapshot
+
+THREADS = 16
+
+
+# Function to call snapshot.cached(key, build) from THREADS threads released
+# together, returning each thread's result or error
+def race(snapshot, key, build):
+    barrier = threading.Barrier(THREADS)
+    results = [None] * THREADS
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = snapshot.cached(key, build)
+        except Exception as error:
+            results[i] = error
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_misses_build_once():
+    snapshot = Snapshot("v1")
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.2)  # Long enough for every thread to arrive and wait
+        return {"figure": len(builds)}
+
+    results = race(snapshot, "Global", build)
+
+    assert len(builds) == 1
+    assert snapshot._flight.builds == 1
+    assert all(result is results[0] for result in results)
+    assert results[0] == {"figure": 1}
+    # Later callers read the cache without building
+    assert snapshot.cached("Global", build) is results[0]
+    assert len(builds) == 1
+
+
+def test_error_reaches_every_waiter():
+    snapshot = Snapshot("v1")
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.2)
+        raise ValueError("bad data")
+
+    results = race(snapshot, "Global", build)
+
+    assert len(builds) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    # A failed build is not cached; the next caller tries again
+    assert "Global" not in snapshot.cache
+    with pytest.raises(ValueError):
+        snapshot.cached("Global", build)
+    assert len(builds) == 2
+
+
+def test_different_keys_build_separately():
+    snapshot = Snapshot("v1")
+    assert snapshot.cached("a", lambda: 1) == 1
+    assert snapshot.cached("b", lambda: 2) == 2
+    assert snapshot._flight.builds == 2
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from common.dates import parse_headers
+from common.serving import load_app
+from common.snapshot import SnapshotStore, use_store
+from common.sources import LocalSource
+
+# Newest day first, like the app's data.csv
+HEADERS = ["3/9", "3/8", "3/1", "2/28", "1/10"]
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    path = tmp_path_factory.mktemp("data") / "data.csv"
+    rows = {
+        "Global": [1, -2, 3, 4, 5],
+        "Canada": [9, 1, -6, 2, 0],
+        "Germany": [-3, 7, 2, -1, 8],
+    }
+    frame = pd.DataFrame(
+        [[region] + [f"{v}%" for v in values] for region, values in rows.items()],
+        columns=["Region"] + HEADERS,
+    )
+    frame.to_csv(path, index=False)
+
+    module = load_app("standardwebapp_template")
+    use_store(module, SnapshotStore(LocalSource(str(path)), module.build_snapshot))
+    yield module.app.test_client()
+    module.store.stop()
+
+
+def test_default_date_is_the_newest_column(client):
+    result = client.get("/rank?k=1").get_json()
+    assert result["date"] == "3/9"
+    assert result["growth"] == [{"region": "Canada", "value": 9.0}]
+    assert result["decline"] == [{"region": "Germany", "value": -3.0}]
+
+
+def test_iso_dates_and_labels_resolve(client):
+    newest = parse_headers(HEADERS).max().strftime("%Y-%m-%d")
+    assert client.get(f"/rank?date={newest}").get_json()["date"] == "3/9"
+    assert client.get("/rank?date=1/10").get_json()["date"] == "1/10"
+    assert client.get("/rank?date=4/1").status_code == 404